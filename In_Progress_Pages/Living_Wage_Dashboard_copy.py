@@ -1,146 +1,14 @@
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
-from lxml import etree
 import openpyxl
 from openpyxl.utils import get_column_letter
 from copy import copy
 from io import BytesIO
 from datetime import datetime
+from form990 import fetch_years, fetch_data
 
 st.set_page_config(page_title='Nonprofit Search Tool', page_icon='C3_Only_Ball.png', layout='wide')
 
-# Function to fetch years and corresponding URLs for the given EIN
-def fetch_years(ein):
-    base_url = "https://projects.propublica.org"
-    url = f"{base_url}/nonprofits/organizations/{ein}"
-    response = requests.get(url)
-    years = {}
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        sections = soup.find_all("section", class_="single-filing-period")
-        for section in sections:
-            year = section['id'].replace("filing", "")
-            links = section.find_all("a", class_="btn")
-            xml_link = None
-            for link in links:
-                if 'xml' in link.text.lower():
-                    xml_link = link['href']
-                    break
-            if xml_link:
-                years[year] = base_url + xml_link
-                object_id = xml_link.split('object_id=')[-1]
-                detailed_url = f"{base_url}/nonprofits/download-xml?object_id={object_id}"
-                years[year] = (xml_link, detailed_url)
-            else:
-                years[year] = "XML link not found"
-    return years
-
-# Define namespaces for XML parsing
-ns = {'efile': 'http://www.irs.gov/efile'}
-
-def get_text(element, xpaths, namespaces):
-    for xpath in xpaths:
-        result = element.xpath(xpath, namespaces=namespaces)
-        if result:
-            return result[0]
-    return "Not Available"
-
-def fetch_data(ein, detailed_url):
-    response = requests.get(detailed_url)
-    if response.status_code == 200:
-        tree = etree.fromstring(response.content)
-        
-        organization_data = {
-            'EIN': ein,
-            'Business Name': get_text(tree, ['//efile:Return/efile:ReturnHeader/efile:Filer/efile:BusinessName/efile:BusinessNameLine1Txt/text()'], ns),
-            'City': get_text(tree, ['//efile:Return/efile:ReturnHeader/efile:Filer/efile:USAddress/efile:CityNm/text()'], ns),
-            'State': get_text(tree, ['//efile:Return/efile:ReturnHeader/efile:Filer/efile:USAddress/efile:StateAbbreviationCd/text()'], ns),
-            'Fiscal Year End': get_text(tree, ['//efile:Return/efile:ReturnHeader/efile:TaxPeriodEndDt/text()'], ns),
-            'Total Assets EOY': get_text(tree, ['//efile:Return/efile:ReturnData/efile:IRS990/efile:TotalAssetsEOYAmt/text()', './/efile:FMVAssetsEOYAmt/text()'], ns),
-            'Total Expenses': get_text(tree, ['//efile:Return/efile:ReturnData/efile:IRS990/efile:CYTotalExpensesAmt/text()', './/efile:TotalExpensesRevAndExpnssAmt/text()'], ns),
-            'Total Revenue': get_text(tree, ['//efile:Return/efile:ReturnData/efile:IRS990/efile:CYTotalRevenueAmt/text()', './/efile:TotalRevAndExpnssAmt/text()'], ns),
-            'Employee Count': get_text(tree, ['//efile:Return/efile:ReturnData/efile:IRS990/efile:TotalEmployeeCnt/text()'], ns)
-        }
-
-        fiscal_year_end_text = organization_data["Fiscal Year End"]
-        if "-" in fiscal_year_end_text:
-            fiscal_year_parts = fiscal_year_end_text.split("-")
-            if len(fiscal_year_parts) == 3:
-                fiscal_year_month = int(fiscal_year_parts[1])
-                fiscal_year_year = int(fiscal_year_parts[0])
-                if fiscal_year_month == 12:
-                    w_year_end = fiscal_year_end_text
-                else:
-                    w_year_end = f"{fiscal_year_year - 1}-12-31"
-                organization_data["WYearEnd"] = w_year_end
-
-        individuals_data = []
-        part_j_sections = tree.xpath('//efile:Return/efile:ReturnData/efile:IRS990ScheduleJ/efile:RltdOrgOfficerTrstKeyEmplGrp', namespaces=ns)
-        for section in part_j_sections:
-            name = get_text(section, ['.//efile:PersonNm/text()', './/efile:BusinessNameLine1Txt/text()'], ns)
-            title = section.xpath('.//efile:TitleTxt/text()', namespaces=ns)[0] if section.xpath('.//efile:TitleTxt/text()', namespaces=ns) else "Not Available"
-            compensation_data = {
-                'Base Compensation': section.xpath('.//efile:BaseCompensationFilingOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:BaseCompensationFilingOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Bonus': section.xpath('.//efile:BonusFilingOrganizationAmount/text()', namespaces=ns)[0] if section.xpath('.//efile:BonusFilingOrganizationAmount/text()', namespaces=ns) else "Not Available",
-                'Other Compensation': section.xpath('.//efile:OtherCompensationFilingOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:OtherCompensationFilingOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Deferred Compensation': section.xpath('.//efile:DeferredCompensationFlngOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:DeferredCompensationFlngOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Nontaxable Benefits': section.xpath('.//efile:NontaxableBenefitsFilingOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:NontaxableBenefitsFilingOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Total Compensation': section.xpath('.//efile:TotalCompensationFilingOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:TotalCompensationFilingOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Reportable Compensation (Part VII)': section.xpath('.//efile:ReportableCompFromOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:ReportableCompFromOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Reportable Compensation From Rltd Org (Part VII)': section.xpath('.//efile:ReportableCompFromRltdOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:ReportableCompFromRltdOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Other Compensation (Part VII)': section.xpath('.//efile:OtherCompensationAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:OtherCompensationAmt/text()', namespaces=ns) else "Not Available",
-                'Avg Hr Per Week (Part VII) Test': section.xpath('.//efile:AverageHoursPerWeekRt/text()', namespaces=ns)[0] if section.xpath('.//efile:AverageHoursPerWeekRt/text()', namespaces=ns) else "Not Available",
-            }
-            individual_data = {'Name': name, 'Title': title}
-            individual_data.update(compensation_data)
-            individuals_data.append(individual_data)
-        
-        individuals_data2 = []
-        part_vii_sections = tree.xpath('//efile:Return/efile:ReturnData/efile:IRS990/efile:Form990PartVIISectionAGrp', namespaces=ns)
-        for section in part_vii_sections:
-            name = get_text(section, ['.//efile:PersonNm/text()', './/efile:BusinessNameLine1Txt/text()'], ns)
-            title = get_text(section, ['.//efile:TitleTxt/text()', './/efile:TitleTxt/text()'], ns)
-            compensation_data2 = {
-                'Reportable Compensation (Part VII)': section.xpath('.//efile:ReportableCompFromOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:ReportableCompFromOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Reportable Compensation From Rltd Org (Part VII)': section.xpath('.//efile:ReportableCompFromRltdOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:ReportableCompFromRltdOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Other Compensation (Part VII)': section.xpath('.//efile:OtherCompensationAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:OtherCompensationAmt/text()', namespaces=ns) else "Not Available",
-                'Avg Hr Per Week (Part VII)': section.xpath('.//efile:AverageHoursPerWeekRt/text()', namespaces=ns)[0] if section.xpath('.//efile:AverageHoursPerWeekRt/text()', namespaces=ns) else "Not Available",
-            }
-            individual_data2 = {'Name': name, 'Title': title}
-            individual_data2.update(compensation_data2)
-            individuals_data2.append(individual_data2)
-        
-        individuals_data3 = []
-        part_pf_sections = tree.xpath('//efile:Return/efile:ReturnData/efile:IRS990PF/efile:OfficerDirTrstKeyEmplInfoGrp/efile:OfficerDirTrstKeyEmplGrp', namespaces=ns)
-        for section in part_pf_sections:
-            name = get_text(section, ['.//efile:PersonNm/text()', './/efile:BusinessNameLine1Txt/text()'], ns)
-            title = get_text(section, ['.//efile:TitleTxt/text()'], ns)
-            compensation_data3 = {
-                'Reportable Compensation (PF)': section.xpath('.//efile:CompensationAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:CompensationAmt/text()', namespaces=ns) else "Not Available",
-                'Employee Benefit Amount (PF)': section.xpath('.//efile:EmployeeBenefitProgramAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:EmployeeBenefitProgramAmt/text()', namespaces=ns) else "Not Available",
-                'Other Compensation (PF)': section.xpath('.//efile:ExpenseAccountOtherAllwncAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:ExpenseAccountOtherAllwncAmt/text()', namespaces=ns) else "Not Available",
-                'Avg Hr Per Week (PF)': section.xpath('.//efile:AverageHrsPerWkDevotedToPosRt/text()', namespaces=ns)[0] if section.xpath('.//efile:AverageHrsPerWkDevotedToPosRt/text()', namespaces=ns) else "Not Available",
-            }
-            individual_data3 = {'Name': name, 'Title': title}
-            individual_data3.update(compensation_data3)
-            individuals_data3.append(individual_data3)
-        
-        combined_individuals_data = individuals_data + individuals_data2 + individuals_data3
-        unique_individuals = {individual['Name']: individual for individual in combined_individuals_data}.values()
-
-        final_individuals_data = []
-        for individual in unique_individuals:
-            merged_data = {}
-            for dataset in [individuals_data, individuals_data2, individuals_data3]:
-                for data in dataset:
-                    if data['Name'] == individual['Name']:
-                        merged_data.update(data)
-            final_individuals_data.append(merged_data)
-
-        return {'organization_data': organization_data, 'individuals_data': final_individuals_data}
-
 def edit_excel_template(data, template_path, num_entries):
     def to_number(value):
         try:
@@ -362,4 +230,3 @@ if st.button("Reset", key='reset_button'):
     st.session_state.clear()
     st.rerun()
 
-
@@ -1,17 +1,33 @@
 import streamlit as st
-import requests
+import http_session
 import pandas as pd
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
+from geocoder import Geocoder
+from location_index import LocationIndex
+from irs990_store import Irs990Store, LOCATION_FIELDS, PEER_FIELDS
 
-# Initialize the Geopy geolocator
-geolocator = Nominatim(user_agent="nonprofit_explorer")
+# Geocoder with a persistent cache and an offline city/ZIP gazetteer in front of Nominatim
+@st.cache_resource
+def get_geocoder():
+    return Geocoder()
+
+# Every organization fetched with coordinates is added, so radius queries read only nearby grid cells
+@st.cache_resource
+def get_location_index():
+    return LocationIndex()
+
+# Bulk IRS 990 extracts loaded with irs990_store.py, queried before the GTDC API
+@st.cache_resource
+def get_irs990_store():
+    return Irs990Store()
 
 BASE_URL = 'https://990-infrastructure.gtdata.org/irs-data/990basic120fields'
 
 def fetch_nonprofit_data(ein):
+    local_filings = get_irs990_store().filings(ein)
+    if not local_filings.empty:
+        return local_filings.to_dict(orient='records')
     params = {'ein': ein}
-    response = requests.get(BASE_URL, params=params)
+    response = http_session.get(BASE_URL, params=params)
     if response.status_code == 200:
         return response.json()
     else:
@@ -19,38 +35,45 @@ def fetch_nonprofit_data(ein):
         return None
 
 def get_coordinates(location):
-    location = geolocator.geocode(location)
-    if location:
-        return (location.latitude, location.longitude)
-    return None
+    return get_geocoder().geocode(location)
 
 def filter_and_group_data(data, filters):
     df = pd.DataFrame(data)
+    location_index = get_location_index()
+    location_index.add_frame(df, 'FILEREIN')
     
     if 'location' in filters and 'miles' in filters:
         location_coords = get_coordinates(filters['location'])
         if location_coords:
-            def within_miles(row):
-                row_coords = (row['latitude'], row['longitude'])
-                return geodesic(location_coords, row_coords).miles <= filters['miles']
-            df = df[df.apply(within_miles, axis=1)]
+            # Filings carry an address but no coordinates; place them by city and ZIP first
+            location_index.add_frame(df, 'FILEREIN', geocode=get_coordinates, location_columns=LOCATION_FIELDS)
+            eins = df['FILEREIN'].astype(str)
+            located = location_index.indexed(eins)
+            if located:
+                nearby = location_index.nearby(location_coords, filters['miles'])
+                unlocated = int((~eins.isin(located)).sum())
+                if unlocated:
+                    st.caption(f"{unlocated} of {len(df)} organizations could not be located and were left out.")
+                df = df[eins.isin(nearby)]
+            else:
+                st.warning("None of these organizations could be located, so the miles filter was not applied.")
     
     if 'min_assets' in filters:
-        df = df[df['assets'] >= filters['min_assets']]
+        df = df[df[PEER_FIELDS['assets']] >= filters['min_assets']]
     if 'max_assets' in filters:
-        df = df[df['assets'] <= filters['max_assets']]
+        df = df[df[PEER_FIELDS['assets']] <= filters['max_assets']]
     if 'min_revenue' in filters:
-        df = df[df['revenue'] >= filters['min_revenue']]
+        df = df[df[PEER_FIELDS['revenue']] >= filters['min_revenue']]
     if 'max_revenue' in filters:
-        df = df[df['revenue'] <= filters['max_revenue']]
+        df = df[df[PEER_FIELDS['revenue']] <= filters['max_revenue']]
     if 'min_employees' in filters:
-        df = df[df['employees'] >= filters['min_employees']]
+        df = df[df[PEER_FIELDS['employees']] >= filters['min_employees']]
     if 'max_employees' in filters:
-        df = df[df['employees'] <= filters['max_employees']]
+        df = df[df[PEER_FIELDS['employees']] <= filters['max_employees']]
     if 'min_expenses' in filters:
-        df = df[df['expenses'] >= filters['min_expenses']]
+        df = df[df[PEER_FIELDS['expenses']] >= filters['min_expenses']]
     if 'max_expenses' in filters:
-        df = df[df['expenses'] <= filters['max_expenses']]
+        df = df[df[PEER_FIELDS['expenses']] <= filters['max_expenses']]
     if 'state' in filters:
         df = df[df['FILERUSSTATE'] == filters['state']]
     if 'city' in filters:
@@ -58,7 +81,7 @@ def filter_and_group_data(data, filters):
     if 'zip' in filters:
         df = df[df['FILERUSZIP'].str.startswith(filters['zip'])]
     
-    peer_groups = df.groupby(['FILERUSCITY', 'FILERUSSTATE']).apply(lambda x: x.to_dict(orient='records')).to_dict()
+    peer_groups = df.groupby(['FILERUSCITY', 'FILERUSSTATE'], observed=True).apply(lambda x: x.to_dict(orient='records')).to_dict()
     
     return df, peer_groups
 
@@ -131,6 +154,12 @@ if st.sidebar.button("Search"):
         filters['zip'] = zip_filter
 
     ein = ein_filter if include_ein else None
+    ranges = {
+        measure: (filters.get(f'min_{measure}'), filters.get(f'max_{measure}'))
+        for measure in PEER_FIELDS if f'min_{measure}' in filters
+    }
+    # Without a location or a range the local search would return every organization in the store
+    has_local_filters = bool(ranges or filters.get('state') or filters.get('city') or filters.get('zip'))
 
     if ein:
         data = fetch_nonprofit_data(ein=ein)
@@ -147,5 +176,22 @@ if st.sidebar.button("Search"):
                 st.write(group)
         else:
             st.error("No data found")
+    elif has_local_filters and get_irs990_store().count():
+        # Without an EIN, discover peers in the local bulk filings
+        data = get_irs990_store().find_peers(
+            state=filters.get('state'), city=filters.get('city'), zip_code=filters.get('zip'), ranges=ranges
+        )
+        # The store has applied the other filters already
+        df, peer_groups = filter_and_group_data(data, {key: filters[key] for key in ('location', 'miles') if key in filters})
+
+        st.write(f"Filtered Nonprofit Data ({len(df)} organizations from local filings):")
+        st.write(df)
+
+        st.write("Peer Groups:")
+        for key, group in peer_groups.items():
+            st.write(f"Location: {key}")
+            st.write(group)
+    elif get_irs990_store().count():
+        st.error("Please provide an EIN, a location or a range to search.")
     else:
         st.error("Please provide an EIN to search.")
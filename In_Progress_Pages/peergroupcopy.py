@@ -1,22 +1,36 @@
 import streamlit as st
-import requests
+import http_session
+import time
 import pandas as pd
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
+from geocoder import Geocoder
+from location_index import LocationIndex
+from query_parser import parse_user_input
+from propublica import search_organizations
+from peer_scoring import rank_peers
+from irs990_store import Irs990Store, to_propublica
+
+# Geocoder with a persistent cache and an offline city/ZIP gazetteer in front of Nominatim
+@st.cache_resource
+def get_geocoder():
+    return Geocoder()
+
+# Every organization fetched with coordinates is added, so radius queries read only nearby grid cells
+@st.cache_resource
+def get_location_index():
+    return LocationIndex()
+
+# Bulk IRS 990 extracts loaded with irs990_store.py; searches they can answer never reach ProPublica
+@st.cache_resource
+def get_irs990_store():
+    return Irs990Store()
 
-# Initialize the Hugging Face model
-model_name = "google/flan-t5-small"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-
-# Initialize the Geopy geolocator
-geolocator = Nominatim(user_agent="nonprofit_explorer")
-
-BASE_URL = 'https://projects.propublica.org/nonprofits/api/v2/search.json'
 ORG_URL = 'https://projects.propublica.org/nonprofits/api/v2/organizations/{}.json'
-def fetch_nonprofit_data(state=None, city=None, zip_code=None, ntee=None, c_code=None, page=0):
-    params = {'page': page}
+PREVIEW_INTERVAL = 0.5  # seconds between re-ranking the partial results while pages stream in
+LOCAL_PAGE_SIZE = 1000  # store matches per page handed to the search loop
+
+def fetch_nonprofit_data(state=None, city=None, zip_code=None, ntee=None, c_code=None):
+    # Yields every page of the search, not just the first, as the pages arrive
+    params = {}
     if state:
         params['state[id]'] = state
     if city:
@@ -27,63 +41,62 @@ def fetch_nonprofit_data(state=None, city=None, zip_code=None, ntee=None, c_code
         params['ntee[id]'] = ntee
     if c_code:
         params['c_code[id]'] = c_code
-    response = requests.get(BASE_URL, params=params)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        st.error("Failed to fetch data from ProPublica")
+    return search_organizations(params)
+
+def fetch_local_candidates(state=None, city=None, zip_code=None):
+    # The same search as pages of ProPublica-shaped records, or None if the store can't answer it
+    if not (state or city or zip_code):
+        return None  # without a location this would be every organization in the store
+    local = get_irs990_store().find_peers(state=state, city=city, zip_code=zip_code)
+    if local.empty:
         return None
+    local = to_propublica(local)
+    # Converted a page at a time, so ranking the first rows doesn't wait for the whole state
+    return (
+        {'cur_page': page, 'organizations': local.iloc[start:start + LOCAL_PAGE_SIZE].to_dict(orient='records'), 'error': None, 'total_results': len(local)}
+        for page, start in enumerate(range(0, len(local), LOCAL_PAGE_SIZE))
+    )
 
 def fetch_organization_by_ein(ein):
-    response = requests.get(ORG_URL.format(ein))
+    local_filings = get_irs990_store().filings(ein)
+    if not local_filings.empty:
+        return {'organization': to_propublica(local_filings).iloc[0].to_dict()}
+    response = http_session.get(ORG_URL.format(ein))
     if response.status_code == 200:
         return response.json()
     else:
         st.error("Failed to fetch organization data from ProPublica")
         return None
-def parse_user_input(user_input):
-    inputs = tokenizer(user_input, return_tensors="pt")
-    outputs = model.generate(inputs.input_ids, max_length=50)
-    result = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    
-    filters = {}
-    if "location" in user_input:
-        filters['location'] = user_input.split("location")[1].strip()
-    return filters
-
 def get_coordinates(location):
-    location = geolocator.geocode(location)
-    if location:
-        return (location.latitude, location.longitude)
-    return None
+    return get_geocoder().geocode(location)
 
-def filter_and_rank_data(data, comparison_org, filters, proximity=None):
+LOCATION_COLUMNS = ('city', 'state', 'zipcode')
+
+def filter_and_rank_data(data, comparison_org, filters, proximity=None, top_k=None):
     df = pd.DataFrame(data['organizations'])
     
     if 'location' in filters and 'proximity' in filters:
         location_coords = get_coordinates(filters['location'])
         if location_coords:
-            def within_proximity(row):
-                row_coords = (row['latitude'], row['longitude'])
-                return geodesic(location_coords, row_coords).miles <= filters['proximity']
-            df = df[df.apply(within_proximity, axis=1)]
+            # Search results carry an address but no coordinates; place them by city and ZIP first
+            location_index = get_location_index()
+            location_index.add_frame(df, 'ein', geocode=get_coordinates, location_columns=LOCATION_COLUMNS)
+            eins = df['ein'].astype(str)
+            located = location_index.indexed(eins)
+            if located:
+                nearby = location_index.nearby(location_coords, filters['proximity'])
+                unlocated = int((~eins.isin(located)).sum())
+                if unlocated:
+                    st.caption(f"{unlocated} of {len(df)} organizations could not be located and were left out.")
+                df = df[eins.isin(nearby)]
+            else:
+                st.warning("None of these organizations could be located, so the proximity filter was not applied.")
     
     if comparison_org:
-        comparison_stats = {
-            'assets': comparison_org.get('totassetsend', 0),
-            'revenue': comparison_org.get('totrevenue', 0),
-            'expenses': comparison_org.get('totfuncexpns', 0),
-            'employees': comparison_org.get('employees', 0),
-        }
-        
-        df['within_assets_range'] = df['totassetsend'].apply(lambda x: 0.5 * comparison_stats['assets'] <= x <= 2 * comparison_stats['assets'] if x is not None else False)
-        df['within_revenue_range'] = df['totrevenue'].apply(lambda x: 0.5 * comparison_stats['revenue'] <= x <= 2 * comparison_stats['revenue'] if x is not None else False)
-        df['within_expenses_range'] = df['totfuncexpns'].apply(lambda x: 0.5 * comparison_stats['expenses'] <= x <= 2 * comparison_stats['expenses'] if x is not None else False)
-        df['within_employees_range'] = df['employees'].apply(lambda x: 0.5 * comparison_stats['employees'] <= x <= 2 * comparison_stats['employees'] if x is not None else False)
-        df['same_state'] = df['state'] == comparison_org['state']
-        
-        df['matches'] = df[['within_assets_range', 'within_revenue_range', 'within_expenses_range', 'within_employees_range', 'same_state']].sum(axis=1)
-        df = df.sort_values('matches', ascending=False)
+        # Weighted log-scale similarity for every candidate in one pass; top_k keeps only the best rows
+        df = rank_peers(df, comparison_org, k=top_k)
+    elif top_k is not None:
+        df = df.head(top_k)
     
     return df
 st.title("Nonprofit Peer Group Finder")
@@ -143,30 +156,57 @@ if st.sidebar.button("Search"):
         if comparison_org_data:
             comparison_org = comparison_org_data['organization']
 
-    data = fetch_nonprofit_data(
-        state=state_filter if include_state else None, 
-        city=city_filter if include_city else None, 
-        zip_code=zip_code_filter if include_zip_code else None, 
-        ntee=ntee_filter if include_ntee else None, 
-        c_code=c_code_filter if include_c_code else None
-    )
+    pages = None
+    if not (include_ntee or include_c_code):
+        # The extracts have no NTEE code, so only location searches can be answered locally;
+        # a search without a location still goes to ProPublica
+        pages = fetch_local_candidates(
+            state=state_filter if include_state else None,
+            city=city_filter if include_city else None,
+            zip_code=zip_code_filter if include_zip_code else None
+        )
+    if pages is None:
+        pages = fetch_nonprofit_data(
+            state=state_filter if include_state else None, 
+            city=city_filter if include_city else None, 
+            zip_code=zip_code_filter if include_zip_code else None, 
+            ntee=ntee_filter if include_ntee else None, 
+            c_code=c_code_filter if include_c_code else None
+        )
+
+    filters = parse_user_input("")
+    if include_proximity:
+        filters['proximity'] = proximity_filter
+
+    # Rank the organizations fetched so far while the remaining pages stream in
+    data = {'organizations': []}
+    preview = st.empty()
+    last_preview = time.monotonic()
+    for page_data in pages:
+        if page_data['error'] is not None:
+            st.error(f"Failed to fetch page {page_data['cur_page']} from ProPublica")
+            continue
+        data['organizations'].extend(page_data['organizations'])
+        if data['organizations'] and time.monotonic() - last_preview >= PREVIEW_INTERVAL:
+            with preview.container():
+                st.caption(f"{len(data['organizations'])} of {page_data.get('total_results', '?')} organizations fetched...")
+                st.dataframe(filter_and_rank_data(data, comparison_org, filters, top_k=20))
+            last_preview = time.monotonic()
+    preview.empty()
     
-    if data and data['organizations']:
+    if data['organizations']:
         # Display comparison organization information
         if comparison_org:
             st.write("### Target Organization Information")
             st.write(comparison_org)
 
-        filters = parse_user_input("")
-        if include_proximity:
-            filters['proximity'] = proximity_filter
-
         df = filter_and_rank_data(data, comparison_org, filters, proximity_filter if include_proximity else None)
         
         st.write("### Similar Organizations")
         for index, row in df.iterrows():
             st.write(f"Name: {row['name']}, City: {row['city']}, State: {row['state']}, Assets: {row.get('totassetsend', 'N/A')}, Revenue: {row.get('totrevenue', 'N/A')}, Employees: {row.get('employees', 'N/A')}")
             if comparison_org:
+                st.write(f"Similarity Score: {row['score']:.2f}")
                 checks = {
                     'Assets': row.get('within_assets_range', False),
                     'Revenue': row.get('within_revenue_range', False),
@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+# Comment board storage; replaces rewriting comments.xlsx on every change
+COMMENTS_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'comments.sqlite')
+LEGACY_EXCEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'comments.xlsx')
+COLUMNS = ['ID', 'Timestamp', 'Name', 'Comment', 'Replies', 'Upvotes', 'Status']
+SCHEMA_VERSION = 2
+PAGE_SIZE = 20
+
+# Feed orderings; id breaks ties so pages never overlap
+SORT_ORDERS = {
+    'Newest': 'timestamp DESC, id DESC',
+    'Oldest': 'timestamp ASC, id ASC',
+    'Most Upvoted': 'upvotes DESC, id DESC',
+}
+
+
+def _text(value):
+    return '' if pd.isna(value) or str(value) == 'nan' else str(value)
+
+
+def read_legacy_comments(path=LEGACY_EXCEL_PATH):
+    """Yield (id, timestamp, name, comment, replies, upvotes, status) rows from the old comments.xlsx."""
+    data = pd.read_excel(path)
+    for _, row in data.iterrows():
+        timestamp = pd.to_datetime(row.get('Timestamp'))
+        yield (
+            int(row['ID']),
+            None if pd.isna(timestamp) else timestamp.isoformat(),
+            _text(row.get('Name')),
+            _text(row.get('Comment')),
+            _text(row.get('Replies')),
+            0 if pd.isna(row.get('Upvotes')) else int(row['Upvotes']),
+            _text(row.get('Status')),
+        )
+
+
+class CommentStore:
+    """
+    SQLite-backed comment board. Every change is a single-row statement in its own transaction,
+    so concurrent sessions no longer overwrite each other's edits.
+    """
+
+    def __init__(self, path=COMMENTS_DB_PATH, legacy_path=LEGACY_EXCEL_PATH):
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            # Readers don't block the writer, which matters when several people have the page open
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        self._migrate(legacy_path)
+
+    def _migrate(self, legacy_path):
+        with self._lock, self._connection:
+            version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                return
+            if version < 1:
+                self._create_comments(legacy_path)
+            if version < 2:
+                # Each feed ordering, with and without a status filter, is an index range scan
+                for name, columns in [
+                    ('timestamp', 'timestamp'),
+                    ('upvotes', 'upvotes'),
+                    ('status_timestamp', 'status, timestamp'),
+                    ('status_upvotes', 'status, upvotes'),
+                ]:
+                    self._connection.execute(f"CREATE INDEX IF NOT EXISTS idx_comments_{name} ON comments ({columns})")
+            self._connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _create_comments(self, legacy_path):
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS comments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT,
+                name TEXT NOT NULL DEFAULT '',
+                comment TEXT NOT NULL,
+                replies TEXT NOT NULL DEFAULT '',
+                upvotes INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL
+            )
+            """
+        )
+        # One-time import of the spreadsheet the page used to rewrite; IDs are kept as they were
+        if legacy_path and os.path.exists(legacy_path):
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO comments (id, timestamp, name, comment, replies, upvotes, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                read_legacy_comments(legacy_path),
+            )
+
+    def _execute(self, sql, parameters=()):
+        with self._lock, self._connection:
+            return self._connection.execute(sql, parameters)
+
+    def add_comment(self, name, comment, status):
+        """Insert a comment and return its ID."""
+        cursor = self._execute(
+            "INSERT INTO comments (timestamp, name, comment, status) VALUES (?, ?, ?, ?)",
+            (datetime.now().isoformat(), name, comment, status),
+        )
+        return cursor.lastrowid
+
+    def add_reply(self, comment_id, name, reply):
+        self._execute("UPDATE comments SET replies = replies || ? WHERE id = ?", (f"{name}: {reply}\n", comment_id))
+
+    def set_status(self, comment_id, status):
+        self._execute("UPDATE comments SET status = ? WHERE id = ?", (status, comment_id))
+
+    def upvote(self, comment_id):
+        self._execute("UPDATE comments SET upvotes = upvotes + 1 WHERE id = ?", (comment_id,))
+
+    def delete(self, comment_id):
+        self._execute("DELETE FROM comments WHERE id = ?", (comment_id,))
+
+    def ids(self):
+        with self._lock:
+            return [row[0] for row in self._connection.execute("SELECT id FROM comments ORDER BY id")]
+
+    def count(self, status=None):
+        where, parameters = self._status_filter(status)
+        with self._lock:
+            return self._connection.execute(f"SELECT COUNT(*) FROM comments {where}", parameters).fetchone()[0]
+
+    def page(self, page=1, page_size=PAGE_SIZE, status=None, sort='Newest'):
+        """
+        Return one page of comments as a DataFrame with the columns the page used to read from comments.xlsx,
+        optionally filtered to a status, in the given sort order.
+        """
+        where, parameters = self._status_filter(status)
+        with self._lock:
+            rows = self._connection.execute(
+                f"""
+                SELECT id, timestamp, name, comment, replies, upvotes, status FROM comments {where}
+                ORDER BY {SORT_ORDERS[sort]} LIMIT ? OFFSET ?
+                """,
+                (*parameters, page_size, (max(page, 1) - 1) * page_size),
+            ).fetchall()
+        return pd.DataFrame(rows, columns=COLUMNS)
+
+    def _status_filter(self, status):
+        if status is None:
+            return '', ()
+        return 'WHERE status = ?', (status,)
@@ -0,0 +1,227 @@
+import copyreg
+import hashlib
+import os
+import pickle
+import threading
+from array import array
+from bisect import bisect_right
+from copy import copy, deepcopy
+from datetime import date, datetime, time, timedelta
+from io import BytesIO
+
+import openpyxl
+from openpyxl.cell.cell import Cell, MergedCell
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.worksheet.dimensions import DimensionHolder
+from openpyxl.worksheet.table import TableList
+from openpyxl.worksheet.worksheet import Worksheet
+
+# path -> (mtime/size signature, content hash, ParsedTemplate)
+_template_cache = {}
+_template_lock = threading.Lock()
+
+# Cell values that are immutable and can be shared between the parsed template and its copies
+_SHARED_VALUE_TYPES = (type(None), str, int, float, bool, date, datetime, time, timedelta)
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _rebuild_dimension_holder(worksheet, default_factory, max_outline, dimensions):
+    holder = DimensionHolder(worksheet, default_factory=default_factory)
+    holder.max_outline = max_outline
+    dict.update(holder, dimensions)
+    return holder
+
+
+def _reduce_dimension_holder(holder):
+    return _rebuild_dimension_holder, (holder.worksheet, holder.default_factory, holder.max_outline, dict(dict.items(holder)))
+
+
+def _rebuild_table_list(tables):
+    table_list = TableList()
+    dict.update(table_list, tables)
+    return table_list
+
+
+def _reduce_table_list(table_list):
+    # TableList.items() returns (name, ref) pairs, so the default dict pickling would lose the tables
+    return _rebuild_table_list, (dict(dict.items(table_list)),)
+
+
+def _new_worksheet(cls):
+    worksheet = cls.__new__(cls)
+    worksheet._cells = {}
+    return worksheet
+
+
+def _reduce_worksheet(worksheet):
+    # Cells are left out of the pickle and copied by _copy_cells, which is several times faster
+    state = {name: value for name, value in worksheet.__dict__.items() if name != '_cells'}
+    return _new_worksheet, (type(worksheet),), state
+
+
+class _TemplatePickler(pickle.Pickler):
+    # DimensionHolder is a defaultdict subclass whose worksheet and default factory don't survive default pickling
+    dispatch_table = copyreg.dispatch_table.copy()
+    dispatch_table[DimensionHolder] = _reduce_dimension_holder
+    dispatch_table[TableList] = _reduce_table_list
+    dispatch_table[Worksheet] = _reduce_worksheet
+
+
+def _worksheets(workbook):
+    return [sheet for sheet in workbook._sheets if type(sheet) is Worksheet]
+
+
+def _copy_cells(cells, parent):
+    new_cell = object.__new__
+    new_style = array.__new__
+    copied = {}
+    for cell in cells:
+        if type(cell) is MergedCell:
+            merged = new_cell(MergedCell)
+            merged.row, merged.column, merged.parent = cell.row, cell.column, parent
+            merged._style = new_style(StyleArray, 'i', cell._style)
+            copied[cell.row, cell.column] = merged
+            continue
+        new = new_cell(Cell)
+        new.row = cell.row
+        new.column = cell.column
+        value = cell._value
+        # Formula objects and rich text are mutable; everything else is shared
+        new._value = value if type(value) in _SHARED_VALUE_TYPES else deepcopy(value)
+        new.data_type = cell.data_type
+        new.parent = parent
+        new._style = new_style(StyleArray, 'i', cell._style)
+        new._hyperlink = None if cell._hyperlink is None else copy(cell._hyperlink)
+        new._comment = None
+        if cell._comment is not None:
+            new.comment = cell._comment  # the setter copies a bound comment and binds the copy
+        copied[cell.row, cell.column] = new
+    return copied
+
+
+class ParsedTemplate:
+    """
+    A workbook parsed once and copied per export: everything but the cells is pickled,
+    and the cells are copied attribute by attribute from the parsed sheets, which is
+    several times cheaper than unpickling them or parsing the file again.
+    """
+
+    def __init__(self, workbook):
+        self._cells = [list(sheet._cells.values()) for sheet in _worksheets(workbook)]
+        buffer = BytesIO()
+        _TemplatePickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(workbook)
+        self._skeleton = buffer.getvalue()
+
+    def copy(self):
+        workbook = pickle.loads(self._skeleton)
+        for sheet, cells in zip(_worksheets(workbook), self._cells):
+            sheet._cells = _copy_cells(cells, sheet)
+        return workbook
+
+
+def load_template(template_path):
+    """
+    Return a private copy of the workbook at template_path.
+    The file is parsed once per process and each call copies the parsed workbook (see
+    ParsedTemplate). The cached parse is replaced when the file's mtime or size changes
+    and its content hash no longer matches.
+    """
+    path = os.path.abspath(template_path)
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _template_lock:
+        cached = _template_cache.get(path)
+        if cached is None or cached[0] != signature:
+            content_hash = _file_hash(path)
+            if cached is not None and cached[1] == content_hash:
+                cached = (signature, content_hash, cached[2])
+            else:
+                cached = (signature, content_hash, ParsedTemplate(openpyxl.load_workbook(path)))
+            _template_cache[path] = cached
+    return cached[2].copy()
+
+
+class MergedCellIndex:
+    """
+    Per-sheet index of merged ranges by row, so "is this cell merged and where is its anchor"
+    is a dict lookup plus a binary search instead of a scan over sheet.merged_cells.ranges.
+    """
+
+    def __init__(self, sheet):
+        self.sheet = sheet
+        self._rebuild()
+
+    def _rebuild(self):
+        rows = {}  # row -> [(min_col, max_col, merged range)]
+        for merged_range in self.sheet.merged_cells.ranges:
+            for row in range(merged_range.min_row, merged_range.max_row + 1):
+                rows.setdefault(row, []).append((merged_range.min_col, merged_range.max_col, merged_range))
+        # Merged ranges never overlap, so each row's intervals can be searched by their start column
+        self._rows = {}
+        for row, intervals in rows.items():
+            intervals.sort(key=lambda interval: interval[0])
+            self._rows[row] = ([interval[0] for interval in intervals], intervals)
+
+    def find(self, row, col):
+        """Return the merged range containing the cell, or None."""
+        entry = self._rows.get(row)
+        if entry is None:
+            return None
+        starts, intervals = entry
+        i = bisect_right(starts, col) - 1
+        if i >= 0 and col <= intervals[i][1]:
+            return intervals[i][2]
+        return None
+
+    def is_merged(self, row, col):
+        return self.find(row, col) is not None
+
+    def get_top_left(self, row, col):
+        merged_range = self.find(row, col)
+        if merged_range is None:
+            return row, col
+        return merged_range.min_row, merged_range.min_col
+
+    def insert_rows(self, row, amount):
+        # openpyxl's insert_rows moves cells but not merged ranges; move the ranges at or below row with them
+        for merged_range in self.sheet.merged_cells.ranges:
+            if merged_range.min_row >= row:
+                merged_range.shift(row_shift=amount)
+            elif merged_range.max_row >= row:
+                # The rows go inside this range, so it grows by them and its new cells are merged cells
+                merged_range.expand(down=amount)
+                for new_row in range(row, row + amount):
+                    for col in range(merged_range.min_col, merged_range.max_col + 1):
+                        merged_cell = MergedCell(self.sheet, row=new_row, column=col)
+                        below = self.sheet._cells.get((row + amount, col))
+                        if below is not None:
+                            merged_cell._style = copy(below._style)
+                        self.sheet._cells[(new_row, col)] = merged_cell
+        self._rebuild()
+
+
+def insert_rows_with_formatting(sheet, row, amount, merged_index=None):
+    """
+    Insert amount rows before row in one shift, then stamp the template row
+    (pushed down to row + amount) onto the new rows, styles and values included.
+    Merged ranges below the insertion point move down with their cells, and ranges
+    spanning it grow by the inserted rows.
+    """
+    if amount <= 0:
+        return
+    sheet.insert_rows(row, amount)
+    if merged_index is None:
+        merged_index = MergedCellIndex(sheet)
+    merged_index.insert_rows(row, amount)
+    template_row = row + amount
+    template_cells = [(cell.column, cell._style, cell.value) for cell in sheet[template_row]]
+    for target_row in range(row, template_row):
+        for column, style, value in template_cells:
+            target_cell = sheet.cell(row=target_row, column=column)
+            target_cell._style = copy(style)
+            if not isinstance(target_cell, MergedCell):  # merged cells have no value of their own
+                target_cell.value = value
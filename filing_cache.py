@@ -0,0 +1,217 @@
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+# Filing XML never changes once ProPublica publishes it, so it can live on disk indefinitely
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'filings')
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+CACHE_SUFFIX = '.xml.z'
+CHUNK_SIZE = 64 * 1024
+
+
+class FilingCache:
+    """
+    Disk cache for filing XML payloads, keyed by object_id.
+    Payloads are zlib-compressed and the least recently used files are evicted
+    once the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # file name -> compressed size, least recently used first
+        self._total_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_entries()
+
+    def _load_entries(self):
+        # Rebuild the LRU order from file modification times left by earlier processes
+        found = []
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(CACHE_SUFFIX):
+                stat = os.stat(os.path.join(self.cache_dir, file_name))
+                found.append((stat.st_mtime, file_name, stat.st_size))
+        for _, file_name, size in sorted(found):
+            self._entries[file_name] = size
+            self._total_bytes += size
+
+    def _file_name(self, object_id):
+        return hashlib.sha256(str(object_id).encode('utf-8')).hexdigest() + CACHE_SUFFIX
+
+    def get(self, object_id):
+        """Return the cached XML bytes for object_id, or None on a miss."""
+        stream = self.open(object_id)
+        if stream is None:
+            return None
+        with stream:
+            return stream.read()
+
+    def open(self, object_id):
+        """Return a readable stream over the cached XML for object_id, or None on a miss."""
+        file_name = self._file_name(object_id)
+        path = os.path.join(self.cache_dir, file_name)
+        with self._lock:
+            if file_name not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(file_name)
+        try:
+            f = open(path, 'rb')
+            os.utime(path)  # keeps the LRU order across restarts
+        except OSError:
+            with self._lock:
+                self._forget(file_name)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return DecompressingReader(f)
+
+    def put(self, object_id, content):
+        temp_path = self._temp_path(object_id)
+        with open(temp_path, 'wb') as f:
+            f.write(zlib.compress(content, 6))
+        self._commit(object_id, temp_path)
+
+    def tee(self, object_id, source, accept=None):
+        """
+        Wrap a readable stream so everything read from it is also compressed into the cache.
+        The entry is only committed once the stream has been read to the end and, if given,
+        accept(head) returns True for the first CHUNK_SIZE bytes.
+        """
+        return CachingReader(self, object_id, source, accept)
+
+    def _temp_path(self, object_id):
+        # Write to a temp file first so a concurrent reader never sees a partial payload
+        path = os.path.join(self.cache_dir, self._file_name(object_id))
+        return f"{path}.{threading.get_ident()}.tmp"
+
+    def _commit(self, object_id, temp_path):
+        file_name = self._file_name(object_id)
+        os.replace(temp_path, os.path.join(self.cache_dir, file_name))
+        size = os.path.getsize(os.path.join(self.cache_dir, file_name))
+        with self._lock:
+            self._forget(file_name)
+            self._entries[file_name] = size
+            self._total_bytes += size
+            self._evict()
+
+    def _forget(self, file_name):
+        size = self._entries.pop(file_name, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            file_name, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(os.path.join(self.cache_dir, file_name))
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            for file_name in list(self._entries):
+                try:
+                    os.remove(os.path.join(self.cache_dir, file_name))
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+            }
+
+
+class DecompressingReader:
+    """File-like reader that inflates a cached payload in chunks instead of all at once."""
+
+    def __init__(self, f):
+        self._file = f
+        self._inflater = zlib.decompressobj()
+
+    def read(self, size=-1):
+        if size < 0:
+            pending = self._inflater.unconsumed_tail + self._file.read()
+            return self._inflater.decompress(pending) + self._inflater.flush()
+        while True:
+            pending = self._inflater.unconsumed_tail or self._file.read(CHUNK_SIZE)
+            if not pending:
+                return self._inflater.flush()
+            data = self._inflater.decompress(pending, size)
+            if data:
+                return data
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CachingReader:
+    """File-like reader that passes a stream through while compressing it into the cache."""
+
+    def __init__(self, cache, object_id, source, accept=None):
+        self._cache = cache
+        self._object_id = object_id
+        self._source = source
+        self._accept = accept
+        self._head = b''
+        self._deflater = zlib.compressobj(6)
+        self._temp_path = cache._temp_path(object_id)
+        self._temp_file = open(self._temp_path, 'wb')
+
+    def read(self, size=-1):
+        data = self._source.read(size) if size >= 0 else self._source.read()
+        if self._temp_file is None:
+            return data
+        if data:
+            if len(self._head) < CHUNK_SIZE:
+                self._head += data[:CHUNK_SIZE - len(self._head)]
+            self._temp_file.write(self._deflater.compress(data))
+        else:
+            self._finish()
+        return data
+
+    def _finish(self):
+        self._temp_file.write(self._deflater.flush())
+        self._temp_file.close()
+        self._temp_file = None
+        if self._accept is None or self._accept(self._head):
+            self._cache._commit(self._object_id, self._temp_path)
+        else:
+            os.remove(self._temp_path)
+
+    def close(self):
+        if self._temp_file is not None:
+            # Abandoned before the end of the stream; a partial payload must not be cached
+            self._temp_file.close()
+            self._temp_file = None
+            os.remove(self._temp_path)
+        self._source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # A parser may stop at the closing root tag without asking for the final empty read
+        if exc_type is None:
+            while self._temp_file is not None and self.read(CHUNK_SIZE):
+                pass
+        self.close()
@@ -0,0 +1,141 @@
+import csv
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+# Local EIN -> (tax year, object_id, form type) index, bulk-loaded from IRS e-file index files
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'filing_index.sqlite')
+BATCH_SIZE = 50000
+# Index files also list other returns (990-T, 990-N, 4720, ...); only the main information return is kept
+MAIN_RETURN_TYPES = {'990', '990EZ', '990PF'}
+
+
+def normalize_ein(ein):
+    return str(ein).strip().replace('-', '').zfill(9)
+
+
+def get_tax_year(tax_period):
+    # IRS tax year is the year the period starts in, e.g. a period ending 2021-06 is tax year 2020
+    tax_period = str(tax_period).strip().replace('-', '')
+    year, month = int(tax_period[:4]), int(tax_period[4:6])
+    return str(year if month == 12 else year - 1)
+
+
+def _normalize_record(record):
+    # IRS CSV indexes use OBJECT_ID/TAX_PERIOD/RETURN_TYPE, the older JSON ones ObjectId/TaxPeriod/FormType
+    fields = {key.replace('_', '').upper(): value for key, value in record.items()}
+    form_type = fields.get('RETURNTYPE') or fields.get('FORMTYPE')
+    if form_type:
+        form_type = str(form_type).strip().upper().replace('-', '').replace(' ', '')
+    return (
+        normalize_ein(fields['EIN']),
+        get_tax_year(fields['TAXPERIOD']),
+        str(fields['OBJECTID']).strip(),
+        form_type,
+    )
+
+
+def is_main_return(record):
+    # Records without a form type are kept; older index files always carry one
+    return not record[3] or record[3] in MAIN_RETURN_TYPES
+
+
+def read_index_file(path):
+    """Yield (ein, tax year, object_id, form type) for each 990, 990-EZ or 990-PF in an IRS CSV or JSON index file."""
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            # e.g. {"Filings2016": [...]}
+            data = next(iter(data.values()), [])
+        records = (_normalize_record(record) for record in data)
+    else:
+        records = _read_csv_records(path)
+    yield from filter(is_main_return, records)
+
+
+def _read_csv_records(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for record in csv.DictReader(f):
+            if record.get('OBJECT_ID') or record.get('ObjectId'):
+                yield _normalize_record(record)
+
+
+class FilingIndex:
+    def __init__(self, path=INDEX_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            # Clustered on (ein, tax_year), so a lookup is a single B-tree range read
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS filings (
+                    ein TEXT NOT NULL,
+                    tax_year TEXT NOT NULL,
+                    object_id TEXT NOT NULL,
+                    form_type TEXT,
+                    PRIMARY KEY (ein, tax_year)
+                ) WITHOUT ROWID
+                """
+            )
+
+    def load(self, records):
+        """
+        Bulk insert (ein, tax year, object_id, form type) records.
+        When a year is filed more than once (amended returns) the newest object_id is kept.
+        Returns the number of records read.
+        """
+        count = 0
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= BATCH_SIZE:
+                self._insert(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self._insert(batch)
+            count += len(batch)
+        return count
+
+    def load_file(self, path):
+        return self.load(read_index_file(path))
+
+    def _insert(self, batch):
+        with self._lock, self._connection:
+            self._connection.executemany(
+                """
+                INSERT INTO filings (ein, tax_year, object_id, form_type) VALUES (?, ?, ?, ?)
+                ON CONFLICT (ein, tax_year) DO UPDATE SET
+                    object_id = excluded.object_id,
+                    form_type = excluded.form_type
+                WHERE excluded.object_id > filings.object_id
+                """,
+                batch,
+            )
+
+    def lookup(self, ein):
+        """Return [(tax year, object_id, form type)] for an EIN, most recent year first."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT tax_year, object_id, form_type FROM filings WHERE ein = ? ORDER BY tax_year DESC",
+                (normalize_ein(ein),),
+            ).fetchall()
+        # Indexes loaded before other return types were filtered out may still hold a 990-T for a year
+        return [row for row in rows if not row[2] or row[2] in MAIN_RETURN_TYPES]
+
+    def count(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM filings").fetchone()[0]
+
+
+if __name__ == '__main__':
+    # python filing_index.py index_2023.csv index_2024.csv ...
+    index = FilingIndex()
+    for index_file in sys.argv[1:]:
+        print(f"{index_file}: {index.load_file(index_file)} filings")
+    print(f"{index.count()} filings indexed")
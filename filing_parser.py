@@ -0,0 +1,333 @@
+from io import BytesIO
+
+from lxml import etree
+
+# Define namespaces for XML parsing
+EFILE_NS = 'http://www.irs.gov/efile'
+ns = {'efile': EFILE_NS}
+NOT_AVAILABLE = "Not Available"
+RETURN_TAG = f"{{{EFILE_NS}}}Return"
+
+
+class NotAFilingError(ValueError):
+    """Raised when a document's root element is not an e-file Return, e.g. an HTML error page."""
+
+
+def _xpath(path):
+    # Compiled once at import; smart_strings=False returns plain str without a back-reference to the tree
+    return etree.XPath(path, namespaces=ns, smart_strings=False)
+
+
+# Organization fields: output key -> XPaths tried in order
+ORGANIZATION_PATHS = [
+    ('Business Name', ['//efile:Return/efile:ReturnHeader/efile:Filer/efile:BusinessName/efile:BusinessNameLine1Txt/text()']),
+    ('City', ['//efile:Return/efile:ReturnHeader/efile:Filer/efile:USAddress/efile:CityNm/text()']),
+    ('State', ['//efile:Return/efile:ReturnHeader/efile:Filer/efile:USAddress/efile:StateAbbreviationCd/text()']),
+    ('Fiscal Year End', ['//efile:Return/efile:ReturnHeader/efile:TaxPeriodEndDt/text()']),
+    ('Total Assets EOY', ['//efile:Return/efile:ReturnData/efile:IRS990/efile:TotalAssetsEOYAmt/text()', './/efile:FMVAssetsEOYAmt/text()']),
+    ('Total Expenses', ['//efile:Return/efile:ReturnData/efile:IRS990/efile:CYTotalExpensesAmt/text()', './/efile:TotalExpensesRevAndExpnssAmt/text()']),
+    ('Total Revenue', ['//efile:Return/efile:ReturnData/efile:IRS990/efile:CYTotalRevenueAmt/text()', './/efile:TotalRevAndExpnssAmt/text()']),
+    ('Employee Count', ['//efile:Return/efile:ReturnData/efile:IRS990/efile:TotalEmployeeCnt/text()']),
+]
+ORGANIZATION_FIELDS = [(key, [_xpath(path) for path in paths]) for key, paths in ORGANIZATION_PATHS]
+
+# Individual sections, in the order of the lists returned by extract_individuals_data
+SECTION_PATHS = [
+    '//efile:Return/efile:ReturnData/efile:IRS990ScheduleJ/efile:RltdOrgOfficerTrstKeyEmplGrp',
+    '//efile:Return/efile:ReturnData/efile:IRS990/efile:Form990PartVIISectionAGrp',
+    '//efile:Return/efile:ReturnData/efile:IRS990PF/efile:OfficerDirTrstKeyEmplInfoGrp/efile:OfficerDirTrstKeyEmplGrp',
+]
+SCHEDULE_J_SECTIONS, PART_VII_SECTIONS, PF_SECTIONS = [_xpath(path) for path in SECTION_PATHS]
+
+# Individual fields per section type: output key -> element names tried in order
+NAME_TAGS = ['PersonNm', 'BusinessNameLine1Txt']
+
+SCHEDULE_J_FIELDS = [
+    ('Name', NAME_TAGS),
+    ('Title', ['TitleTxt']),
+    ('Base Compensation', ['BaseCompensationFilingOrgAmt']),
+    ('Bonus', ['BonusFilingOrganizationAmount']),
+    ('Other Compensation', ['OtherCompensationFilingOrgAmt']),
+    ('Deferred Compensation', ['DeferredCompensationFlngOrgAmt']),
+    ('Nontaxable Benefits', ['NontaxableBenefitsFilingOrgAmt']),
+    ('Total Compensation', ['TotalCompensationFilingOrgAmt']),
+    ('Reportable Compensation (Part VII)', ['ReportableCompFromOrgAmt']),
+    ('Reportable Compensation From Rltd Org (Part VII)', ['ReportableCompFromRltdOrgAmt']),
+    ('Other Compensation (Part VII)', ['OtherCompensationAmt']),
+    ('Avg Hr Per Week (Part VII)', ['AverageHoursPerWeekRt']),
+]
+
+PART_VII_FIELDS = [
+    ('Name', NAME_TAGS),
+    ('Title', ['TitleTxt']),
+    ('Reportable Compensation (Part VII)', ['ReportableCompFromOrgAmt']),
+    ('Reportable Compensation From Rltd Org (Part VII)', ['ReportableCompFromRltdOrgAmt']),
+    ('Other Compensation (Part VII)', ['OtherCompensationAmt']),
+    ('Avg Hr Per Week (Part VII)', ['AverageHoursPerWeekRt']),
+]
+
+PF_FIELDS = [
+    ('Name', NAME_TAGS),
+    ('Title', ['TitleTxt']),
+    ('Reportable Compensation (PF)', ['CompensationAmt']),
+    ('Employee Benefit Amount (PF)', ['EmployeeBenefitProgramAmt']),
+    ('Other Compensation (PF)', ['ExpenseAccountOtherAllwncAmt']),
+    ('Avg Hr Per Week (PF)', ['AverageHrsPerWkDevotedToPosRt']),
+]
+
+
+class SectionExtractor:
+    """
+    Extracts a field map from a section in a single walk over its descendants.
+    Each element is dispatched by tag, so the cost is one pass per section no matter
+    how many fields are mapped. The first element with text wins, matching the old
+    './/efile:Tag/text()' lookups; when a field lists several tags, earlier tags take priority.
+    """
+
+    def __init__(self, fields):
+        self.keys = [key for key, _ in fields]
+        self.dispatch = {}  # namespaced tag -> [(key, priority)]
+        for key, tags in fields:
+            for priority, tag in enumerate(tags):
+                self.dispatch.setdefault(f'{{{EFILE_NS}}}{tag}', []).append((key, priority))
+
+    def feed(self, found, element):
+        """Record element into found if it is the best match so far for one of the fields."""
+        for key, priority in self.dispatch.get(element.tag, ()):
+            current = found.get(key)
+            if current is None or priority < current[0]:
+                found[key] = (priority, element.text)
+
+    def finish(self, found):
+        return {key: found[key][1] if key in found else NOT_AVAILABLE for key in self.keys}
+
+    def extract(self, section):
+        found = {}  # key -> (priority, text)
+        dispatch = self.dispatch
+        for element in section.iterdescendants():
+            if element.tag in dispatch and element.text is not None:
+                self.feed(found, element)
+        return self.finish(found)
+
+
+schedule_j_extractor = SectionExtractor(SCHEDULE_J_FIELDS)
+part_vii_extractor = SectionExtractor(PART_VII_FIELDS)
+pf_extractor = SectionExtractor(PF_FIELDS)
+
+
+def get_first(element, xpaths):
+    """Return the text from the first compiled XPath that matches, or "Not Available"."""
+    for xpath in xpaths:
+        result = xpath(element)
+        if result:
+            return result[0]
+    return NOT_AVAILABLE
+
+
+def get_w_year_end(fiscal_year_end_text):
+    # W-2 year end: the fiscal year end if it is in December, otherwise the prior calendar year end
+    if "-" in fiscal_year_end_text:
+        fiscal_year_parts = fiscal_year_end_text.split("-")
+        if len(fiscal_year_parts) == 3:
+            fiscal_year_month = int(fiscal_year_parts[1])
+            fiscal_year_year = int(fiscal_year_parts[0])
+            if fiscal_year_month == 12:
+                return fiscal_year_end_text
+            return f"{fiscal_year_year - 1}-12-31"
+    return None
+
+
+def finish_organization_data(organization_data):
+    w_year_end = get_w_year_end(organization_data["Fiscal Year End"])
+    if w_year_end is not None:
+        organization_data["WYearEnd"] = w_year_end
+    return organization_data
+
+
+def extract_organization_data(tree, ein):
+    organization_data = {'EIN': ein}
+    for key, xpaths in ORGANIZATION_FIELDS:
+        organization_data[key] = get_first(tree, xpaths)
+    return finish_organization_data(organization_data)
+
+
+def extract_individuals_data(tree):
+    """Return the Schedule J, Part VII and 990-PF individual lists for a parsed filing."""
+    individuals_data = [schedule_j_extractor.extract(section) for section in SCHEDULE_J_SECTIONS(tree)]
+    individuals_data2 = [part_vii_extractor.extract(section) for section in PART_VII_SECTIONS(tree)]
+    individuals_data3 = [pf_extractor.extract(section) for section in PF_SECTIONS(tree)]
+    return individuals_data, individuals_data2, individuals_data3
+
+
+# Source labels for merged individuals, in the order of the lists returned by extract_individuals_data
+INDIVIDUAL_SOURCES = ['Schedule J', 'Part VII', '990-PF']
+
+
+def normalize_key(text):
+    return ' '.join(text.upper().replace('.', ' ').replace(',', ' ').split())
+
+
+def merge_individuals(individuals_data, individuals_data2, individuals_data3):
+    """
+    Merge the Schedule J, Part VII and 990-PF records of each person in a single pass.
+    Records are keyed by normalized name and title. A record whose title differs is still
+    merged into an existing person with the same name, unless that person already has a
+    record from the same source, in which case they are treated as two different people.
+    Later sources override earlier ones field by field, and each merged record lists its
+    sources under 'Sources'.
+    """
+    merged = {}  # (name key, title key) -> merged record, in first-seen order
+    sources = {}  # (name key, title key) -> set of source labels
+    keys_by_name = {}  # name key -> [(name key, title key)]
+    datasets = [individuals_data, individuals_data2, individuals_data3]
+    for source, dataset in zip(INDIVIDUAL_SOURCES, datasets):
+        for data in dataset:
+            name_key = normalize_key(data['Name'])
+            key = (name_key, normalize_key(data['Title']))
+            if key not in merged:
+                candidates = keys_by_name.setdefault(name_key, [])
+                key = next((candidate for candidate in candidates if source not in sources[candidate]), key)
+                if key not in merged:
+                    candidates.append(key)
+                    merged[key] = {}
+                    sources[key] = set()
+            merged[key].update(data)
+            sources[key].add(source)
+
+    final_individuals_data = []
+    for key, record in merged.items():
+        record['Sources'] = ', '.join(source for source in INDIVIDUAL_SOURCES if source in sources[key])
+        final_individuals_data.append(record)
+    return final_individuals_data
+
+
+def _path_tags(path):
+    """
+    Turn an XPath such as '//efile:A/efile:B/text()' into the namespaced tags it must end with.
+    './/' paths match anywhere, so only their last tag is kept.
+    """
+    steps = [step for step in path.replace('/text()', '').split('/') if step and step != '.']
+    tags = tuple(f"{{{EFILE_NS}}}{step.split(':', 1)[1]}" for step in steps)
+    return tags[-1:] if path.startswith('.//') else tags
+
+
+def _matches_path(element, tags):
+    for tag in reversed(tags):
+        if element is None or element.tag != tag:
+            return False
+        element = element.getparent()
+    return True
+
+
+def _build_organization_dispatch():
+    # last tag -> [(key, priority, full path tags)]
+    dispatch = {}
+    for key, paths in ORGANIZATION_PATHS:
+        for priority, path in enumerate(paths):
+            tags = _path_tags(path)
+            dispatch.setdefault(tags[-1], []).append((key, priority, tags))
+    return dispatch
+
+
+def _build_section_dispatch():
+    # last tag -> [(full path tags, extractor, index of the individuals list)]
+    dispatch = {}
+    extractors = [schedule_j_extractor, part_vii_extractor, pf_extractor]
+    for index, (path, extractor) in enumerate(zip(SECTION_PATHS, extractors)):
+        tags = _path_tags(path)
+        dispatch.setdefault(tags[-1], []).append((tags, extractor, index))
+    return dispatch
+
+
+# Streaming lookups are keyed by the last tag; the rest of the path is checked against the element's ancestors
+ORGANIZATION_DISPATCH = _build_organization_dispatch()
+SECTION_DISPATCH = _build_section_dispatch()
+
+
+def stream_filing(source, ein):
+    """
+    Parse a filing from a file-like object with iterparse, returning the same
+    (organization_data, (individuals_data, individuals_data2, individuals_data3))
+    as extract_organization_data and extract_individuals_data.
+    Every element is cleared as soon as it has been read, so peak memory stays flat
+    no matter how many Part VII rows the filing has.
+    """
+    organization_found = {}  # key -> (priority, text)
+    individuals = ([], [], [])
+    section = None  # (element, extractor, list index, found) for the section being read
+    root = None
+
+    for event, element in etree.iterparse(source, events=('start', 'end'), huge_tree=True):
+        tag = element.tag
+        if event == 'start':
+            if root is None:
+                root = element
+                if tag != RETURN_TAG:
+                    raise NotAFilingError(tag)
+            if section is None:
+                for tags, extractor, index in SECTION_DISPATCH.get(tag, ()):
+                    if _matches_path(element, tags):
+                        section = (element, extractor, index, {})
+                        break
+            continue
+
+        if element.text is not None:
+            for key, priority, tags in ORGANIZATION_DISPATCH.get(tag, ()):
+                current = organization_found.get(key)
+                if (current is None or priority < current[0]) and _matches_path(element, tags):
+                    organization_found[key] = (priority, element.text)
+            if section is not None and element is not section[0]:
+                section[1].feed(section[3], element)
+
+        if section is not None and element is section[0]:
+            individuals[section[2]].append(section[1].finish(section[3]))
+            section = None
+
+        # Everything needed from this element has been read; drop it and any finished siblings
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+    organization_data = {'EIN': ein}
+    for key, _ in ORGANIZATION_PATHS:
+        organization_data[key] = organization_found[key][1] if key in organization_found else NOT_AVAILABLE
+    return finish_organization_data(organization_data), individuals
+
+
+# Filings up to this size are parsed in memory with the compiled extractors; larger ones are streamed
+STREAMING_THRESHOLD_BYTES = 4 * 1024 * 1024
+READ_SIZE = 64 * 1024
+
+
+class _PrefixedReader:
+    """File-like reader that replays bytes already read from source before continuing with it."""
+
+    def __init__(self, head, source):
+        self._head = BytesIO(head)
+        self._source = source
+
+    def read(self, size=-1):
+        data = self._head.read(size)
+        if size < 0:
+            return data + self._source.read()
+        return data or self._source.read(size)
+
+
+def parse_filing(source, ein):
+    """
+    Parse a filing from a file-like object, returning
+    (organization_data, (individuals_data, individuals_data2, individuals_data3)).
+    Only the first STREAMING_THRESHOLD_BYTES are buffered; anything bigger is handed to stream_filing.
+    """
+    chunks = []
+    size = 0
+    while size < STREAMING_THRESHOLD_BYTES:
+        chunk = source.read(READ_SIZE)
+        if not chunk:
+            tree = etree.fromstring(b''.join(chunks), parser=etree.XMLParser(huge_tree=True))
+            if tree.tag != RETURN_TAG:
+                raise NotAFilingError(tree.tag)
+            return extract_organization_data(tree, ein), extract_individuals_data(tree)
+        chunks.append(chunk)
+        size += len(chunk)
+    return stream_filing(_PrefixedReader(b''.join(chunks), source), ein)
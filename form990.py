@@ -0,0 +1,305 @@
+from datetime import datetime
+from io import BytesIO
+
+import streamlit as st
+from bs4 import BeautifulSoup
+from lxml import etree
+
+import http_session
+from excel_templates import MergedCellIndex, insert_rows_with_formatting, load_template
+from filing_parser import NOT_AVAILABLE, NotAFilingError, merge_individuals, parse_filing
+from propublica import BASE_URL, lookup_years, open_filing_xml
+
+# Shared 990 lookup, parsing and template filling for every tool page. Pages import these
+# instead of defining their own, so all of them go through one HTTP session, one filing
+# cache and one template cache.
+
+# Year lists and parsed filings are memoized for every session of the app, not per browser session
+# Newly published filings are picked up within a few hours for EINs found by scraping ProPublica;
+# for EINs in the local filing index, only once the new IRS index files are loaded
+YEARS_TTL = 6 * 3600
+FILING_TTL = 7 * 24 * 3600  # a filing's contents never change once published
+MAX_CACHED_EINS = 2000
+MAX_CACHED_FILINGS = 1000
+
+
+class _NotCached(Exception):
+    # Raised inside the cached functions so failed lookups are retried instead of memoized;
+    # result is handed back to the caller uncached (None for a failed lookup)
+    def __init__(self, result=None):
+        super().__init__()
+        self.result = result
+
+
+def _fetch_years(ein):
+    # The local filing index answers without a network call; scraping ProPublica is the fallback
+    # for EINs it doesn't know, so an indexed EIN's years are only as recent as the index files
+    years = lookup_years(ein)
+    if years:
+        return years
+    url = f"{BASE_URL}/nonprofits/organizations/{ein}"
+    response = http_session.get(url)
+    years = {}
+    if response.status_code == 200:
+        soup = BeautifulSoup(response.text, 'html.parser')
+        sections = soup.find_all("section", class_="single-filing-period")
+        for section in sections:
+            year = section['id'].replace("filing", "")
+            links = section.find_all("a", class_="btn")
+            xml_link = None
+            for link in links:
+                # Check if 'XML' is in the text, ignoring case
+                if 'xml' in link.text.lower():
+                    xml_link = link['href']
+                    break
+            if xml_link:
+                object_id = xml_link.split('object_id=')[-1]
+                detailed_url = f"{BASE_URL}/nonprofits/download-xml?object_id={object_id}"
+                years[year] = (xml_link, detailed_url)
+            else:
+                years[year] = "XML link not found"  # Handle cases where no XML link is found
+    return years
+
+
+def _fetch_data(ein, detailed_url):
+    filing = open_filing_xml(detailed_url)
+    if filing is not None:
+        with filing:
+            try:
+                organization_data, (individuals_data, individuals_data2, individuals_data3) = parse_filing(filing, ein)
+            except (NotAFilingError, etree.XMLSyntaxError):
+                return None  # an error page or a truncated download
+
+        final_individuals_data = merge_individuals(individuals_data, individuals_data2, individuals_data3)
+        return {'organization_data': organization_data, 'individuals_data': final_individuals_data}
+
+
+def _has_organization_data(organization_data):
+    # A filing where nothing but the EIN we passed in was found is not worth keeping for a week
+    return any(value != NOT_AVAILABLE for key, value in organization_data.items() if key != 'EIN')
+
+
+@st.cache_data(ttl=YEARS_TTL, max_entries=MAX_CACHED_EINS, show_spinner=False)
+def _cached_years(ein):
+    years = _fetch_years(ein)
+    if not years:
+        raise _NotCached
+    return years
+
+
+@st.cache_data(ttl=FILING_TTL, max_entries=MAX_CACHED_FILINGS, show_spinner=False)
+def _cached_data(ein, detailed_url):
+    fetched_data = _fetch_data(ein, detailed_url)
+    if fetched_data is None:
+        raise _NotCached
+    if not _has_organization_data(fetched_data['organization_data']):
+        # Parsed fine but nothing was found, e.g. an older schema; show it, but look again next time
+        raise _NotCached(fetched_data)
+    return fetched_data
+
+
+def fetch_years(ein):
+    """Return {year: (xml_link, detailed_url)} for an EIN, or "XML link not found" for years without XML."""
+    try:
+        return _cached_years(ein.strip())
+    except _NotCached:
+        return {}
+
+
+def fetch_data(ein, detailed_url):
+    """
+    Return {'organization_data', 'individuals_data'} for a filing, or None if it can't be
+    downloaded or is not a filing. Each call gets its own copy, so pages can add to the
+    result without touching the cache.
+    """
+    try:
+        return _cached_data(ein.strip(), detailed_url)
+    except _NotCached as e:
+        return e.result
+
+
+def clear_cache():
+    """Forget every memoized year list and filing, e.g. after ProPublica publishes new returns."""
+    _cached_years.clear()
+    _cached_data.clear()
+
+
+def to_number(value):
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def to_proper_case(text):
+    return text.title()
+
+
+def to_date(value, date_format="%Y-%m-%d"):
+    try:
+        return datetime.strptime(value, date_format)
+    except ValueError:
+        return value
+
+
+def _save(workbook):
+    edited_file = BytesIO()
+    workbook.save(edited_file)
+    edited_file.seek(0)  # Move the cursor to the start of the stream
+    return edited_file
+
+
+def edit_excel_template(data, template_path):
+    """Fill the C3 990 Tool template: one PEER GROUP row and one position row per chart entry."""
+    workbook = load_template(template_path)
+    sheet = workbook["Form 990 - Position Title"]
+    sheet2 = workbook["PEER GROUP"]
+    sheet4 = workbook["Form 990PF - Position Title"]
+    row = 6
+    for entry in data:
+        sheet2[f"B{row}"] = to_proper_case(entry["Organization_Name"])
+        sheet2[f"C{row}"] = to_number(entry["EIN"])
+        sheet2[f"F{row}"] = to_proper_case(entry["City"])
+        sheet2[f"G{row}"] = entry["State"]
+        sheet2[f"E{row}"] = to_date(entry["W2E"])
+        sheet2[f"D{row}"] = to_date((entry["Fiscal_Year_End"]))
+        sheet2[f"H{row}"] = to_number(entry["Total Assets"])
+        sheet2[f"I{row}"] = to_number(entry["Total Expenses"])
+        sheet2[f"J{row}"] = to_number(entry["Total Revenue"])
+        sheet2[f"N{row}"] = to_number(entry["Employee Count"])
+
+        sheet[f"H{row}"] = to_proper_case(entry["Employee_Name"])
+        sheet[f"I{row}"] = to_proper_case(entry["Title_Of_Position"])
+        sheet[f"P{row}"] = to_number(entry["Base Compensation"])
+        sheet[f"T{row}"] = to_number(entry["Deferred Compensation"])
+        sheet[f"S{row}"] = to_number(entry["Other Compensation"])
+        sheet[f"U{row}"] = to_number(entry["Nontaxable Benefits"])
+        sheet[f"Q{row}"] = to_number(entry["Bonus"])
+
+        sheet4[f"H{row}"] = to_proper_case(entry["Employee_Name"])
+        sheet4[f"I{row}"] = to_proper_case(entry["Title_Of_Position"])
+        sheet4[f"O{row}"] = to_number(entry["Reportable Comp PF"])
+        sheet4[f"P{row}"] = to_number(entry["Benefits Comp PF"])
+        sheet4[f"Q{row}"] = to_number(entry["Expenses and Other Comp PF"])
+
+        row += 1
+    return _save(workbook)
+
+
+def edit_peer_group_template(data, template_path, target_org_data=None):
+    """
+    Fill the bulk upload template: rows are inserted for every EIN/year in PEER GROUP and every
+    chart entry in the position tabs, and the SETUP tab gets the target organization if there is one.
+    """
+    workbook = load_template(template_path)
+    sheet = workbook["Form 990 - Position Title"]
+    sheet2 = workbook["PEER GROUP"]
+    sheet4 = workbook["Form 990PF - Position Title"]
+    sheet_setup = workbook["SETUP"]
+    start_row_peer_group = 6  # The row to start inserting in PEER GROUP
+    start_row_990 = 6  # The row to start inserting in Form 990 - Position Title
+    start_row_990pf = 6  # The row to start inserting in Form 990PF - Position Title
+    index_counter = 1  # Index counter for PEER GROUP
+
+    unique_ein_years = set()
+    entries_to_insert = []
+
+    # Collect unique EIN/year entries
+    for entry in data:
+        unique_key = (entry["EIN"], entry["W2E"])
+        if unique_key not in unique_ein_years:
+            unique_ein_years.add(unique_key)
+            entries_to_insert.append(entry)
+
+    # Insert the required number of rows into the PEER GROUP tab
+    peer_group_merged = MergedCellIndex(sheet2)
+    insert_rows_with_formatting(sheet2, start_row_peer_group, len(entries_to_insert), peer_group_merged)
+
+    # Fill in the PEER GROUP tab with data
+    for entry in entries_to_insert:
+        sheet2[f"A{start_row_peer_group}"] = index_counter
+        sheet2[f"B{start_row_peer_group}"] = to_proper_case(entry["Organization_Name"])
+
+        # Handle merged cells
+        if not peer_group_merged.is_merged(start_row_peer_group, 3):
+            sheet2[f"C{start_row_peer_group}"] = to_number(entry["EIN"])
+        else:
+            top_left_row, top_left_col = peer_group_merged.get_top_left(start_row_peer_group, 3)
+            if top_left_row == start_row_peer_group and top_left_col == 3:
+                sheet2[f"C{start_row_peer_group}"] = to_number(entry["EIN"])
+
+        sheet2[f"F{start_row_peer_group}"] = to_proper_case(entry["City"])
+        sheet2[f"G{start_row_peer_group}"] = entry["State"]
+        sheet2[f"E{start_row_peer_group}"] = to_date(entry.get("W2E", entry.get("WYearEnd", "Not Available")))
+        sheet2[f"D{start_row_peer_group}"] = to_date(entry.get("Fiscal_Year_End", "Not Available"))
+        sheet2[f"H{start_row_peer_group}"] = to_number(entry.get("Total Assets", "Not Available"))
+        sheet2[f"I{start_row_peer_group}"] = to_number(entry.get("Total Expenses", "Not Available"))
+        sheet2[f"J{start_row_peer_group}"] = to_number(entry.get("Total Revenue", "Not Available"))
+        sheet2[f"N{start_row_peer_group}"] = to_number(entry.get("Employee Count", "Not Available"))
+        sheet2[f"K{start_row_peer_group}"] = to_number(entry["Total Assets"]) / 1000000
+        sheet2[f"L{start_row_peer_group}"] = to_number(entry["Total Expenses"]) / 1000000
+        sheet2[f"M{start_row_peer_group}"] = to_number(entry["Total Revenue"]) / 1000000
+        start_row_peer_group += 1
+        index_counter += 1
+
+    # Generate entries for Form 990 and Form 990PF with individual data
+    insert_rows_with_formatting(sheet, start_row_990, len(data))
+    insert_rows_with_formatting(sheet4, start_row_990pf, len(data))
+    for entry in data:
+        sheet[f"C{start_row_990}"] = to_number(entry["EIN"])
+        sheet[f"B{start_row_990}"] = to_proper_case(entry["Organization_Name"])
+        sheet[f"F{start_row_990}"] = to_proper_case(entry["City"])
+        sheet[f"G{start_row_990}"] = entry["State"]
+        sheet[f"E{start_row_990}"] = to_date(entry.get("W2E", entry.get("WYearEnd", "Not Available")))
+        sheet[f"D{start_row_990}"] = to_date(entry.get("Fiscal_Year_End", "Not Available"))
+        sheet[f"J{start_row_990}"] = to_number(entry["Total Assets"]) / 1000000
+        sheet[f"K{start_row_990}"] = to_number(entry["Total Expenses"]) / 1000000
+        sheet[f"L{start_row_990}"] = to_number(entry["Total Revenue"]) / 1000000
+        sheet[f"M{start_row_990}"] = to_number(entry.get("Employee Count", "Not Available"))
+
+        sheet[f"H{start_row_990}"] = to_proper_case(entry["Employee_Name"])
+        sheet[f"I{start_row_990}"] = to_proper_case(entry["Title_Of_Position"])
+        sheet[f"P{start_row_990}"] = to_number(entry["Base Compensation"]) / 1000
+        sheet[f"T{start_row_990}"] = to_number(entry["Deferred Compensation"]) / 1000
+        sheet[f"S{start_row_990}"] = to_number(entry["Other Compensation"]) / 1000
+        sheet[f"U{start_row_990}"] = to_number(entry["Nontaxable Benefits"]) / 1000
+        sheet[f"Q{start_row_990}"] = to_number(entry["Bonus"]) / 1000
+        sheet[f"R{start_row_990}"] = (to_number(entry["Bonus"]) / 1000) + (to_number(entry["Base Compensation"]) / 1000)
+        sheet[f"V{start_row_990}"] = (to_number(entry["Bonus"]) / 1000) + (to_number(entry["Base Compensation"]) / 1000) + (to_number(entry["Other Compensation"]) / 1000) + (to_number(entry["Deferred Compensation"]) / 1000) + to_number(entry["Nontaxable Benefits"]) / 1000
+
+        sheet4[f"C{start_row_990pf}"] = to_number(entry["EIN"])
+        sheet4[f"B{start_row_990pf}"] = to_proper_case(entry["Organization_Name"])
+        sheet4[f"F{start_row_990pf}"] = to_proper_case(entry["City"])
+        sheet4[f"G{start_row_990pf}"] = entry["State"]
+        sheet4[f"E{start_row_990pf}"] = to_date(entry.get("W2E", entry.get("WYearEnd", "Not Available")))
+        sheet4[f"D{start_row_990pf}"] = to_date(entry.get("Fiscal_Year_End", "Not Available"))
+        sheet4[f"J{start_row_990pf}"] = to_number(entry["Total Assets"]) / 1000000
+        sheet4[f"K{start_row_990pf}"] = to_number(entry["Total Expenses"]) / 1000000
+        sheet4[f"L{start_row_990pf}"] = to_number(entry.get("Employee Count", "Not Available"))
+
+        sheet4[f"H{start_row_990pf}"] = to_proper_case(entry["Employee_Name"])
+        sheet4[f"I{start_row_990pf}"] = to_proper_case(entry["Title_Of_Position"])
+        sheet4[f"O{start_row_990pf}"] = to_number(entry["Reportable Comp PF"]) / 1000
+        sheet4[f"P{start_row_990pf}"] = to_number(entry["Benefits Comp PF"]) / 1000
+        sheet4[f"Q{start_row_990pf}"] = to_number(entry["Expenses and Other Comp PF"]) / 1000
+        sheet4[f"R{start_row_990pf}"] = to_number(entry["Expenses and Other Comp PF"]) / 1000 + (to_number(entry["Benefits Comp PF"]) / 1000) + (to_number(entry["Reportable Comp PF"]) / 1000)
+
+        start_row_990 += 1
+        start_row_990pf += 1
+
+    if target_org_data:
+        sheet_setup["C4"] = to_proper_case(target_org_data["Business Name"])
+        sheet_setup["C9"] = to_proper_case(target_org_data["City"])
+        sheet_setup["C10"] = target_org_data["State"]
+        sheet_setup["C11"] = to_number(target_org_data["Total Assets EOY"])
+        sheet_setup["C12"] = to_number(target_org_data["Total Revenue"])
+        sheet_setup["C13"] = to_number(target_org_data["Total Expenses"])
+        sheet_setup["C14"] = to_number(target_org_data["Employee Count"])
+    # Set row height for all sheets except SETUP
+    for sheet_name in workbook.sheetnames:
+        if sheet_name != "SETUP":
+            sheet = workbook[sheet_name]
+            for row in range(1, sheet.max_row + 1):
+                sheet.row_dimensions[row].height = 30
+
+    return _save(workbook)
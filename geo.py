@@ -0,0 +1,42 @@
+import numpy as np
+
+# Mean Earth radius; haversine on a sphere is within about 0.5% of geopy's ellipsoidal geodesic
+EARTH_RADIUS_MILES = 3958.7613
+MILES_PER_DEGREE_LAT = np.pi * EARTH_RADIUS_MILES / 180
+
+
+def haversine_miles(lat, lon, lats, lons):
+    """Great-circle distance in miles from (lat, lon) to each of the points in the lats/lons arrays."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    lats, lons = np.radians(np.asarray(lats, dtype=float)), np.radians(np.asarray(lons, dtype=float))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def bounding_box(lat, lon, miles):
+    """Return (min_lat, max_lat, min_lon, max_lon) enclosing every point within miles of (lat, lon)."""
+    lat_delta = miles / MILES_PER_DEGREE_LAT
+    min_lat, max_lat = lat - lat_delta, lat + lat_delta
+    if min_lat <= -90 or max_lat >= 90:
+        # The circle covers a pole, so every longitude is in range
+        return max(min_lat, -90), min(max_lat, 90), -180, 180
+    # Longitude degrees shrink with latitude; use the widest point of the circle
+    lon_delta = np.degrees(np.arcsin(min(1, np.sin(np.radians(lat_delta)) / np.cos(np.radians(lat)))))
+    return min_lat, max_lat, lon - lon_delta, lon + lon_delta
+
+
+def within_miles(lats, lons, center, miles):
+    """
+    Boolean mask of the points within miles of center, for whole arrays at once.
+    A bounding box discards most points with plain comparisons; the haversine is only
+    computed for the ones inside it. Points with missing coordinates are never within range.
+    """
+    lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+    lat, lon = center
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, miles)
+    # Shift longitudes into the box's frame so boxes that cross the antimeridian still compare correctly
+    shifted_lons = (lons - min_lon) % 360 + min_lon
+    mask = (lats >= min_lat) & (lats <= max_lat) & (shifted_lons <= max_lon)
+    candidates = np.flatnonzero(mask)
+    mask[candidates] = haversine_miles(lat, lon, lats[candidates], lons[candidates]) <= miles
+    return mask
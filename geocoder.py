@@ -0,0 +1,144 @@
+import csv
+import glob
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from geopy.exc import GeocoderServiceError
+from geopy.extra.rate_limiter import RateLimiter
+from geopy.geocoders import Nominatim
+
+# Geocoding: offline gazetteer first, then the persistent cache, then Nominatim as a last resort
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(BASE_DIR, '.cache', 'geocode.sqlite')
+# US Census Gazetteer files, e.g. 2023_Gaz_zcta_national.txt and 2023_Gaz_place_national.txt.
+# They are not in the repository; download them from census.gov into this directory.
+GAZETTEER_DIR = os.path.join(BASE_DIR, 'gazetteer')
+USER_AGENT = 'nonprofit_explorer'
+NOMINATIM_DELAY = 1  # seconds between requests, per Nominatim's usage policy
+MISS_TTL = 7 * 24 * 3600  # unresolved locations are retried after a week
+
+ZIP_PATTERN = re.compile(r'\b(\d{5})(?:-\d{4})?$')
+# Census place names carry their legal description, e.g. "Springfield city"
+PLACE_SUFFIXES = re.compile(r'\s+(city and borough|city|town|village|borough|CDP|municipality|township)$', re.IGNORECASE)
+
+
+def normalize_location(location):
+    """Cache key for a location string: lowercase, single spaces, no stray punctuation."""
+    location = re.sub(r'[^\w\s,-]', ' ', str(location).lower())
+    location = re.sub(r'\s*,\s*', ', ', location)
+    return re.sub(r'\s+', ' ', location).strip(' ,')
+
+
+def _gazetteer_rows(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f, delimiter='\t')
+        header = [column.strip() for column in next(reader)]
+        for row in reader:
+            yield dict(zip(header, (value.strip() for value in row)))
+
+
+def load_gazetteer(gazetteer_dir=GAZETTEER_DIR):
+    """Return ({zip: (lat, lon)}, {'city, st': (lat, lon)}) from the Census ZCTA and place files in gazetteer_dir."""
+    zips, places = {}, {}
+    for path in sorted(glob.glob(os.path.join(gazetteer_dir, '*.txt'))):
+        for row in _gazetteer_rows(path):
+            coordinates = (float(row['INTPTLAT']), float(row['INTPTLONG']))
+            if 'USPS' in row and 'NAME' in row:
+                name = PLACE_SUFFIXES.sub('', row['NAME'])
+                places.setdefault(normalize_location(f"{name}, {row['USPS']}"), coordinates)
+            elif 'GEOID' in row:
+                zips[row['GEOID'].zfill(5)] = coordinates
+    return zips, places
+
+
+class Geocoder:
+    """
+    Location string -> (latitude, longitude). Without the gazetteer files in gazetteer_dir,
+    every location not yet in the cache is sent to Nominatim, one request per second.
+    Only Nominatim's "no result" answers are remembered as misses; a timeout, throttle
+    or server error is not cached, so the location is tried again on the next call.
+    """
+
+    def __init__(self, cache_path=CACHE_PATH, gazetteer_dir=GAZETTEER_DIR, user_agent=USER_AGENT):
+        if cache_path != ':memory:':
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        self._connection = sqlite3.connect(cache_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS geocodes (
+                    query TEXT PRIMARY KEY,
+                    latitude REAL,
+                    longitude REAL,
+                    source TEXT NOT NULL,
+                    created REAL NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+        self.gazetteer_dir = gazetteer_dir
+        self._gazetteer = None
+        # Let service errors through, so a failed request is not mistaken for "no such place"
+        self._geocode = RateLimiter(
+            Nominatim(user_agent=user_agent).geocode, min_delay_seconds=NOMINATIM_DELAY, swallow_exceptions=False
+        )
+
+    def _lookup_gazetteer(self, key):
+        if self._gazetteer is None:
+            self._gazetteer = load_gazetteer(self.gazetteer_dir)
+        zips, places = self._gazetteer
+        match = ZIP_PATTERN.search(key)
+        if match and match.group(1) in zips:
+            return zips[match.group(1)]
+        place = ZIP_PATTERN.sub('', key).strip(' ,')
+        if place in places:
+            return places[place]
+        # "springfield il" -> "springfield, il"
+        city, _, state = place.rpartition(' ')
+        if len(state) == 2 and f"{city.rstrip(',')}, {state}" in places:
+            return places[f"{city.rstrip(',')}, {state}"]
+        return None
+
+    def _cached(self, key):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT latitude, longitude, created FROM geocodes WHERE query = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return False, None
+        latitude, longitude, created = row
+        if latitude is None:
+            # A remembered miss; retry once it is old enough
+            return time.time() - created < MISS_TTL, None
+        return True, (latitude, longitude)
+
+    def _store(self, key, coordinates, source):
+        latitude, longitude = coordinates or (None, None)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO geocodes (query, latitude, longitude, source, created) VALUES (?, ?, ?, ?, ?)",
+                (key, latitude, longitude, source, time.time()),
+            )
+
+    def geocode(self, location):
+        """Return (latitude, longitude) for a location string, or None if it cannot be resolved."""
+        key = normalize_location(location)
+        if not key:
+            return None
+        coordinates = self._lookup_gazetteer(key)
+        if coordinates is not None:
+            # Gazetteer hits are cheap to repeat, so they are not written to the cache
+            return coordinates
+        found, coordinates = self._cached(key)
+        if found:
+            return coordinates
+        try:
+            result = self._geocode(location)
+        except GeocoderServiceError:
+            return None
+        coordinates = (result.latitude, result.longitude) if result else None
+        self._store(key, coordinates, 'nominatim')
+        return coordinates
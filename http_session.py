@@ -0,0 +1,110 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Throttling (429) and transient server errors are retried with exponential backoff
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.5
+DEFAULT_TIMEOUT = 30
+POOL_SIZE = 16
+
+# Requests per second and burst size allowed per host, so bulk pulls stay under ProPublica's throttle
+DEFAULT_RATE = 4
+DEFAULT_BURST = 8
+HOST_RATES = {
+    'projects.propublica.org': (4, 8),
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a request may be sent."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Reserve a token even if it is not there yet; callers queue up behind each other
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+_session = None
+_buckets = {}
+_lock = threading.Lock()
+
+
+def _host_bucket(host):
+    with _lock:
+        if host not in _buckets:
+            rate, burst = HOST_RATES.get(host, (DEFAULT_RATE, DEFAULT_BURST))
+            _buckets[host] = TokenBucket(rate, burst)
+        return _buckets[host]
+
+
+def get_bucket(url):
+    return _host_bucket(urlparse(url).hostname)
+
+
+class MeteredRetry(Retry):
+    """Retry that takes a token from the host's bucket before each retry goes out."""
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        # Raises MaxRetryError once the retries are used up, in which case nothing is sent
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        if _pool is not None:
+            _host_bucket(_pool.host).acquire()
+        return retry
+
+
+class MeteredAdapter(HTTPAdapter):
+    """Adapter that takes a token before sending; retries inside urllib3 are metered by MeteredRetry."""
+
+    def send(self, request, **kwargs):
+        get_bucket(request.url).acquire()
+        return super().send(request, **kwargs)
+
+
+def _build_session():
+    retry = MeteredRetry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=['GET', 'HEAD'],
+        respect_retry_after_header=True,
+        raise_on_status=False,  # hand the final response back so callers can check status_code
+    )
+    adapter = MeteredAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """Return the process-wide session, so every page reuses the same keep-alive connections."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def get(url, params=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """Drop-in replacement for requests.get that is pooled, retried and rate limited on every request sent."""
+    return get_session().get(url, params=params, timeout=timeout, **kwargs)
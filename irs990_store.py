@@ -0,0 +1,258 @@
+import glob
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from filing_index import get_tax_year, normalize_ein
+
+# Local copy of bulk IRS 990 extracts, one Parquet file per tax year sorted by EIN,
+# with the columns of the GTDC "990 Basic 120 Fields" data dictionary
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DICTIONARY_PATH = os.path.join(BASE_DIR, 'GTDC 990 API - Data Dictionary.xlsx')
+DICTIONARY_SHEET = '990 Basic 120 Fields '
+STORE_DIR = os.path.join(BASE_DIR, '.cache', 'irs990')
+COMPRESSION = 'zstd'
+ROW_GROUP_SIZE = 20000  # small row groups let an EIN lookup skip most of a year's file
+
+EIN_FIELD = 'FILEREIN'
+YEAR_FIELD = 'TAXYEAR'
+# Header text, addresses and checkboxes; every other dictionary field is an amount or a count
+TEXT_FIELDS = {
+    'FILEREIN', 'FILERNAME1', 'FILERNAME2', 'TAXPERBEGIN', 'TAXPEREND', 'URL',
+    'ADDRESCHANGE', 'INITIARETURN', 'FINALRRETURN', 'AMENDERETURN', 'SPECCONDDESC',
+    'DBANBNLINE11', 'DBANBNLINE22', 'INCARENM', 'FILERNAMECTRL',
+    'FILERUS1', 'FILERUS2', 'FILERUSCITY', 'FILERUSSTATE', 'FILERUSZIP',
+    'FILERFOR1', 'FILERFOR2', 'FILERFORCITY', 'FILERFORSTATE', 'FILERFORPOST', 'FILERFORCTRY',
+    'ORGANIZATION', 'ORGANIZATION3', 'ORGANIZATION1', 'ORGANIZATION7', 'WEBSITSITEIT', 'FORMATIONORM',
+    'GRANTOORORGA', 'DONOADVIFUND', 'EXCEBENETRAN', 'PRIEXCBENTRA', 'LOTOOFDQQPP',
+    'BSNRLTWITORG', 'BSRLTHFAMEEM', 'OFENWIBSRLLT', 'MATEDIVEMISU', 'MINUGOVEBODY',
+    'FOPRTOGOBOOD', 'CONFINTEPOLI', 'WHISTLPOLICY', 'DOCURETEPOLI', 'COPRCEEOO', 'JOINTCCOSTSO',
+}
+# IRS SOI annual extract columns for the fields it shares with the dictionary
+SOI_EXTRACT_FIELDS = {
+    'EIN': 'FILEREIN',
+    'TAX_PD': 'TAXPEREND',
+    'TOTREVENUE': 'TOTREVCURYEA',
+    'TOTFUNCEXPNS': 'TOTFUNEXPTOT',
+    'TOTASSETSEND': 'TOASEOOYY',
+    'TOTLIABEND': 'TOLIEOOYY',
+    'TOTNETASSETEND': 'TNAFBEOY',
+    'NOEMPLYEESW3CNT': 'TOTAEMPLCNTN',
+}
+
+# Peer search measures -> dictionary fields
+PEER_FIELDS = {
+    'assets': 'TOASEOOYY',
+    'revenue': 'TOTREVCURYEA',
+    'expenses': 'TOTFUNEXPTOT',
+    'employees': 'TOTAEMPLCNTN',
+}
+LOCATION_FIELDS = ('FILERUSCITY', 'FILERUSSTATE', 'FILERUSZIP')
+PEER_COLUMNS = [EIN_FIELD, YEAR_FIELD, 'FILERNAME1', *LOCATION_FIELDS, *PEER_FIELDS.values()]
+# Dictionary fields -> the ProPublica search field names peer_scoring works with
+PROPUBLICA_FIELDS = {
+    'FILEREIN': 'ein',
+    'FILERNAME1': 'name',
+    'FILERUSCITY': 'city',
+    'FILERUSSTATE': 'state',
+    'FILERUSZIP': 'zipcode',
+    'TOASEOOYY': 'totassetsend',
+    'TOTREVCURYEA': 'totrevenue',
+    'TOTFUNEXPTOT': 'totfuncexpns',
+    'TOTAEMPLCNTN': 'employees',
+}
+
+
+def load_fields(dictionary_path=DICTIONARY_PATH):
+    """Dictionary variable names in order; a few fields are listed under two parts but stored once."""
+    names = pd.read_excel(dictionary_path, sheet_name=DICTIONARY_SHEET, engine='openpyxl')['Variable Name']
+    return list(dict.fromkeys(names.dropna().astype(str).str.strip()))
+
+
+def _schema(fields):
+    types = {name: pa.string() if name in TEXT_FIELDS else pa.float64() for name in fields}
+    types[YEAR_FIELD] = pa.int32()
+    return pa.schema([(name, types[name]) for name in fields])
+
+
+def _read_records(path):
+    # GTDC API responses saved as JSON: a list of records, or an object wrapping one
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = next((value for value in data.values() if isinstance(value, list)), [])
+    return pd.DataFrame(data)
+
+
+def read_extract(path, fields):
+    """Read a bulk extract (CSV, JSON or Parquet) into a frame with exactly the dictionary fields."""
+    lower = path.lower()
+    if lower.endswith('.json'):
+        data = _read_records(path)
+    elif lower.endswith('.parquet'):
+        data = pd.read_parquet(path)
+    else:
+        data = pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[''], encoding='utf-8-sig')
+    data.columns = [str(column).strip().upper() for column in data.columns]
+    data = data.rename(columns={soi: field for soi, field in SOI_EXTRACT_FIELDS.items() if field not in data})
+
+    columns = {}
+    for name in fields:
+        if name not in data:
+            columns[name] = pd.Series(None, index=data.index, dtype=object)
+        elif name in TEXT_FIELDS:
+            columns[name] = data[name].astype('string').str.strip()
+        else:
+            columns[name] = pd.to_numeric(data[name], errors='coerce')
+    frame = pd.DataFrame(columns)
+    frame = frame[frame[EIN_FIELD].notna()].copy()
+    # Same form as filing_index.normalize_ein, vectorized
+    frame[EIN_FIELD] = frame[EIN_FIELD].str.replace('-', '', regex=False).str.zfill(9)
+    # SOI extracts only carry the tax period; derive the year the same way the filing index does
+    missing_year = frame[YEAR_FIELD].isna() & frame['TAXPEREND'].notna()
+    if missing_year.any():
+        period_years = frame.loc[missing_year, 'TAXPEREND'].map(lambda period: int(get_tax_year(period)))
+        frame[YEAR_FIELD] = frame[YEAR_FIELD].fillna(period_years)
+    return frame[frame[YEAR_FIELD].notna()]
+
+
+def _year_path(store_dir, tax_year):
+    return os.path.join(store_dir, f"{int(tax_year)}.parquet")
+
+
+def _write_year(frame, path, schema):
+    # Later extracts win for a repeated (EIN, tax year), e.g. an amended return
+    frame = frame.drop_duplicates(EIN_FIELD, keep='last').sort_values(EIN_FIELD, kind='stable')
+    table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    pq.write_table(table, temp_path, compression=COMPRESSION, row_group_size=ROW_GROUP_SIZE)
+    os.replace(temp_path, path)
+    return table.num_rows
+
+
+def ingest(paths, store_dir=STORE_DIR, dictionary_path=DICTIONARY_PATH):
+    """
+    Merge bulk extract files into the store. Only the tax years present in the new files
+    are rewritten. Returns {tax year: filings stored for that year}.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    fields = load_fields(dictionary_path)
+    schema = _schema(fields)
+    new_rows = pd.concat([read_extract(path, fields) for path in paths], ignore_index=True)
+    stored = {}
+    for tax_year, year_rows in new_rows.groupby(YEAR_FIELD, sort=True):
+        path = _year_path(store_dir, tax_year)
+        if os.path.exists(path):
+            year_rows = pd.concat([pq.read_table(path).to_pandas(), year_rows], ignore_index=True)
+        stored[int(tax_year)] = _write_year(year_rows, path, schema)
+    return stored
+
+
+def _range_mask(values, low=None, high=None):
+    mask = np.ones(len(values), dtype=bool)
+    if low is not None:
+        mask &= values >= low
+    if high is not None:
+        mask &= values <= high
+    return mask
+
+
+def _category_mask(column, predicate):
+    # Evaluate the predicate over the categories and look the rows up by code; missing values never match
+    matched = np.append(np.asarray(predicate(column.cat.categories), dtype=bool), False)
+    return matched[column.cat.codes.to_numpy()]
+
+
+class Irs990Store:
+    """
+    Query side of the store. The latest filing of every EIN is read once (only the peer
+    columns, memory-mapped) and kept until the store files change, so peer searches are
+    array comparisons over memory rather than API calls.
+    """
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        self._lock = threading.Lock()
+        self._latest = None
+        self._signature = None
+
+    def _paths(self):
+        return sorted(glob.glob(os.path.join(self.store_dir, '*.parquet')))
+
+    def _current_signature(self, paths):
+        return tuple((path, os.stat(path).st_mtime_ns) for path in paths)
+
+    def filings(self, ein, columns=None):
+        """Every stored filing for an EIN, most recent tax year first."""
+        ein = normalize_ein(ein)
+        frames = []
+        for path in self._paths():
+            # Files are sorted by EIN, so the row group statistics rule out all but one row group
+            table = pq.read_table(path, columns=columns, filters=[(EIN_FIELD, '=', ein)], memory_map=True)
+            if table.num_rows:
+                frames.append(table.to_pandas())
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True).sort_values(YEAR_FIELD, ascending=False, ignore_index=True)
+
+    def latest(self):
+        """One row per EIN from its most recent filing, with PEER_COLUMNS."""
+        paths = self._paths()
+        signature = self._current_signature(paths)
+        with self._lock:
+            if self._signature != signature:
+                frames = [pq.read_table(path, columns=PEER_COLUMNS, memory_map=True).to_pandas() for path in paths]
+                latest = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=PEER_COLUMNS)
+                # Files are read oldest year first, so the last row per EIN is its latest filing
+                latest = latest.drop_duplicates(EIN_FIELD, keep='last').reset_index(drop=True)
+                # Location filters then compare each distinct city, state or ZIP once, not every row
+                for column in LOCATION_FIELDS:
+                    latest[column] = latest[column].str.upper().astype('category')
+                self._latest = latest
+                self._signature = signature
+            return self._latest
+
+    def find_peers(self, state=None, city=None, zip_code=None, ranges=None):
+        """
+        Latest filings matching the location filters and the {measure: (min, max)} ranges,
+        where a measure is a PEER_FIELDS key and either bound may be None.
+        """
+        latest = self.latest()
+        mask = np.ones(len(latest), dtype=bool)
+        if state:
+            mask &= _category_mask(latest['FILERUSSTATE'], lambda states: states == state.strip().upper())
+        if city:
+            mask &= _category_mask(latest['FILERUSCITY'], lambda cities: cities.str.contains(city.strip().upper(), regex=False))
+        if zip_code:
+            mask &= _category_mask(latest['FILERUSZIP'], lambda zips: zips.str.startswith(zip_code.strip()))
+        for measure, (low, high) in (ranges or {}).items():
+            values = latest[PEER_FIELDS[measure]].to_numpy(dtype=float, na_value=np.nan)
+            with np.errstate(invalid='ignore'):
+                mask &= _range_mask(values, low, high)
+        peers = latest[mask].copy()
+        # Hand the locations back as plain strings, so grouping or comparing them on the pages
+        # doesn't go through every category of the full table
+        for column in LOCATION_FIELDS:
+            peers[column] = peers[column].astype(peers[column].cat.categories.dtype)
+        return peers
+
+    def count(self):
+        return len(self.latest())
+
+
+def to_propublica(df):
+    """Rename dictionary fields to the ProPublica search names used by the peer scoring."""
+    return df.rename(columns=PROPUBLICA_FIELDS)
+
+
+if __name__ == '__main__':
+    # python irs990_store.py 23eoextract990.csv gtdc_2022.json ...
+    for year, filings in ingest(sys.argv[1:]).items():
+        print(f"{year}: {filings} filings")
+    print(f"{Irs990Store().count()} organizations stored")
@@ -0,0 +1,170 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# EPI Family Budget Calculator workbook, converted once into one Parquet file per sheet
+WORKBOOK_PATH = 'fbc_data_2024_V1.2.xlsx'
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'living_wage')
+SHEETS = ('County_Annual', 'Metro_Annual')
+COMPRESSION = 'zstd'
+
+MONETARY_COLUMNS = ['Housing', 'Food', 'Transportation', 'Healthcare', 'Other Necessities ', 'Childcare', 'Taxes']
+HEALTHCARE_CREDIT = 0.20  # share of Healthcare left after the credit
+THRIVING_MULTIPLIER = 2  # Other Necessities are doubled for the thriving wage
+MAX_CACHED_SELECTIONS = 32
+
+_lock = threading.Lock()
+
+
+def _store_path(sheet_name, store_dir=STORE_DIR):
+    return os.path.join(store_dir, f"{sheet_name}.parquet")
+
+
+def _source_signature(workbook_path):
+    stat = os.stat(workbook_path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _coerce_types(data):
+    # Excel columns can mix numbers and text; keep them numeric where possible and text otherwise
+    for column in data.columns:
+        if data[column].dtype == object:
+            try:
+                data[column] = pd.to_numeric(data[column])
+            except (ValueError, TypeError):
+                data[column] = data[column].map(lambda value: value if pd.isna(value) else str(value))
+    return data
+
+
+def ingest(workbook_path=WORKBOOK_PATH, store_dir=STORE_DIR, sheets=SHEETS):
+    """Convert the workbook's sheets into compressed Parquet files. Returns {sheet: rows written}."""
+    os.makedirs(store_dir, exist_ok=True)
+    signature = _source_signature(workbook_path)
+    frames = pd.read_excel(workbook_path, sheet_name=list(sheets), header=0, engine='openpyxl')
+    written = {}
+    for sheet_name in sheets:
+        data = frames[sheet_name].dropna(axis='columns', how='all')  # Drop columns with all NaN values
+        table = pa.Table.from_pandas(_coerce_types(data), preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'source': signature.encode()})
+        path = _store_path(sheet_name, store_dir)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        pq.write_table(table, temp_path, compression=COMPRESSION)
+        os.replace(temp_path, path)
+        written[sheet_name] = table.num_rows
+    return written
+
+
+def _is_current(sheet_name, workbook_path, store_dir):
+    path = _store_path(sheet_name, store_dir)
+    if not os.path.exists(path):
+        return False
+    if not os.path.exists(workbook_path):
+        # Deployments may ship the Parquet files without the source workbook
+        return True
+    metadata = pq.read_schema(path).metadata or {}
+    return metadata.get(b'source') == _source_signature(workbook_path).encode()
+
+
+def load_sheet(sheet_name, columns=None, exclude=(), workbook_path=WORKBOOK_PATH, store_dir=STORE_DIR):
+    """
+    Load a sheet from the Parquet store, ingesting the workbook first if the store is missing
+    or older than the workbook. Only the requested columns are read, memory-mapped.
+    """
+    with _lock:
+        if not _is_current(sheet_name, workbook_path, store_dir):
+            ingest(workbook_path, store_dir)
+    path = _store_path(sheet_name, store_dir)
+    if columns is None:
+        columns = pq.read_schema(path).names
+    columns = [column for column in columns if column not in exclude]
+    return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+
+class AreaIndex:
+    """
+    State -> area -> (provider, dependent) -> row positions, built once per sheet so the
+    dashboard's filters are dict lookups instead of boolean masks over the whole frame.
+    """
+
+    def __init__(self, data, area_column, state_column='State abv.'):
+        self.data = data
+        self.area_column = area_column
+        self._states = list(data[state_column].dropna().unique())
+        self._rows = {}  # state -> area -> (provider, dependent) -> positions in data order
+        groups = data.groupby([state_column, area_column, 'Provider', 'Dependent'], sort=False).indices
+        for (state, area, provider, dependent), positions in groups.items():
+            self._rows.setdefault(state, {}).setdefault(area, {})[(provider, dependent)] = positions
+        self._areas = {state: sorted(areas) for state, areas in self._rows.items()}
+
+    def states(self):
+        return self._states
+
+    def areas(self, state):
+        return self._areas.get(state, [])
+
+    def positions(self, state, area, providers, dependents):
+        configurations = self._rows.get(state, {}).get(area, {})
+        selected = [configurations[key] for key in ((p, d) for p in providers for d in dependents) if key in configurations]
+        if not selected:
+            return np.empty(0, dtype=np.intp)
+        # Keep the rows in sheet order, as the boolean mask did
+        return np.sort(np.concatenate(selected))
+
+    def select(self, state, area, providers, dependents):
+        return self.data.iloc[self.positions(state, area, providers, dependents)]
+
+
+class WageVariants:
+    """
+    Living, Living + Healthcare Credit and Thriving totals for every row of a sheet.
+    All three are computed in one matrix product per selection of monetary columns,
+    and the most recent selections are kept so the dashboard only slices them.
+    """
+
+    def __init__(self, data, max_entries=MAX_CACHED_SELECTIONS):
+        self.index = data.index
+        self.max_entries = max_entries
+        # Blank cells count as zero, as they did in the row-wise sums; NaN would spread through the product
+        self._values = np.nan_to_num(data[MONETARY_COLUMNS].to_numpy(dtype=float))
+        self._total = np.nan_to_num(data['Total'].to_numpy(dtype=float)) if 'Total' in data else np.zeros(len(data))
+        self._healthcare = MONETARY_COLUMNS.index('Healthcare')
+        self._other = MONETARY_COLUMNS.index('Other Necessities ')
+        self.credited_healthcare = data['Healthcare'] * HEALTHCARE_CREDIT
+        self.thriving_other = data['Other Necessities '] * THRIVING_MULTIPLIER
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def totals(self, selected_columns):
+        """Return a frame of 'Living', 'Healthcare Credit' and 'Thriving' totals aligned with the sheet."""
+        key = tuple(column for column in MONETARY_COLUMNS if column in selected_columns)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        weights = np.zeros((len(MONETARY_COLUMNS), 3))
+        for column in key:
+            weights[MONETARY_COLUMNS.index(column)] = 1
+        weights[self._healthcare, 1:] *= HEALTHCARE_CREDIT
+        weights[self._other, 2] *= THRIVING_MULTIPLIER
+        totals = self._values @ weights
+        if not key:
+            # With nothing selected the sheet's own Total stands; the thriving sum is empty
+            totals[:, 0] = totals[:, 1] = self._total
+        frame = pd.DataFrame(totals, index=self.index, columns=['Living', 'Healthcare Credit', 'Thriving'])
+        with self._lock:
+            self._cache[key] = frame
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return frame
+
+
+if __name__ == '__main__':
+    # python living_wage_data.py [fbc_data_2024_V1.2.xlsx]
+    for sheet, rows in ingest(*sys.argv[1:2]).items():
+        print(f"{sheet}: {rows} rows")
@@ -0,0 +1,114 @@
+import re
+import zipfile
+from io import BytesIO
+from itertools import groupby
+from operator import itemgetter
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.chart import BarChart, Reference
+
+# Layout of the LW_TW_Exhibit sheet in Living_Wage_Template.xlsx
+EXHIBIT_HEADERS = ['Provider, Dependent Configuration', 'Living Wage', 'Thriving Wage']
+SUMMARY_HEADERS = ['State', 'Area'] + EXHIBIT_HEADERS
+CURRENCY_FORMAT = '"$"#,##0'
+COLUMN_WIDTHS = {'A': 41, 'B': 23.5, 'C': 25.5}
+FIRST_DATA_ROW = 4
+MAX_SHEET_TITLE = 31
+
+
+def iter_exhibits(area_index, wage_variants, states, selected_columns, providers, dependents):
+    """
+    Yield (state, area, [(configuration, living wage, thriving wage)]) for every area of the given states,
+    with wages in thousands as in the single-area exhibit. Totals come from one vectorized pass.
+    """
+    totals = wage_variants.totals(selected_columns)
+    living = (totals['Healthcare Credit'].to_numpy() / 1000).round(2)
+    thriving = (totals['Thriving'].to_numpy() / 1000).round(2)
+    data = area_index.data
+    configurations = (data['Provider'].astype(str) + ',' + data['Dependent'].astype(str)).to_numpy()
+    for state in states:
+        for area in area_index.areas(state):
+            rows = area_index.positions(state, area, providers, dependents)
+            if len(rows):
+                yield state, area, list(zip(configurations[rows], living[rows].tolist(), thriving[rows].tolist()))
+
+
+def _sheet_title(state, area, used_titles):
+    # Excel sheet names are at most 31 characters, unique, and cannot contain []:*?/\
+    base = re.sub(r'[\[\]:*?/\\]', '', f"{state} {area}")[:MAX_SHEET_TITLE].strip()
+    title, n = base, 1
+    while title.lower() in used_titles:
+        n += 1
+        suffix = f" ({n})"
+        title = base[:MAX_SHEET_TITLE - len(suffix)] + suffix
+    used_titles.add(title.lower())
+    return title
+
+
+def _currency_cell(sheet, value):
+    cell = WriteOnlyCell(sheet, value=value)
+    cell.number_format = CURRENCY_FORMAT
+    return cell
+
+
+def _write_exhibit(workbook, title, state, area, rows, chart=True):
+    sheet = workbook.create_sheet(title)
+    for column, width in COLUMN_WIDTHS.items():
+        sheet.column_dimensions[column].width = width
+    sheet.merged_cells.add('A2:C2')
+    heading = f"Household Living/Thriving Wage for {area}, {state}"
+    sheet.append([])
+    sheet.append([heading])
+    sheet.append(EXHIBIT_HEADERS)
+    for configuration, living, thriving in rows:
+        sheet.append([configuration, _currency_cell(sheet, living), _currency_cell(sheet, thriving)])
+    if chart:
+        _add_chart(sheet, heading, FIRST_DATA_ROW + len(rows) - 1)
+
+
+def _add_chart(sheet, heading, last_row):
+    # Same clustered Living/Thriving column chart as the template, sized to this area's rows
+    chart = BarChart()
+    chart.type = 'col'
+    chart.grouping = 'clustered'
+    chart.title = heading
+    chart.y_axis.title = 'Living/Thriving Wage (000s)'
+    chart.y_axis.number_format = CURRENCY_FORMAT
+    chart.add_data(Reference(sheet, min_col=2, max_col=3, min_row=FIRST_DATA_ROW - 1, max_row=last_row), titles_from_data=True)
+    chart.set_categories(Reference(sheet, min_col=1, min_row=FIRST_DATA_ROW, max_row=last_row))
+    chart.width, chart.height = 15, 7.5
+    sheet.add_chart(chart, 'F1')
+
+
+def write_exhibits_workbook(exhibits, stream, charts=True):
+    """
+    Write one LW_TW_Exhibit-style sheet per area, plus a Summary sheet listing every row, to stream.
+    Uses a write-only workbook, so rows go to disk as they are appended instead of piling up in memory.
+    Charts are about half the cost of a sheet; pass charts=False for very large runs.
+    Returns the number of areas written.
+    """
+    workbook = Workbook(write_only=True)
+    summary = workbook.create_sheet('Summary')
+    summary.append(SUMMARY_HEADERS)
+    used_titles = {'summary'}
+    count = 0
+    for state, area, rows in exhibits:
+        _write_exhibit(workbook, _sheet_title(state, area, used_titles), state, area, rows, charts)
+        for configuration, living, thriving in rows:
+            summary.append([state, area, configuration, _currency_cell(summary, living), _currency_cell(summary, thriving)])
+        count += 1
+    workbook.save(stream)
+    return count
+
+
+def write_exhibits_zip(exhibits, stream, charts=True):
+    """Write one exhibits workbook per state into a ZIP archive on stream. Returns the number of areas written."""
+    count = 0
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+        # Exhibits arrive grouped by state, so only one state's workbook is built at a time
+        for state, state_exhibits in groupby(exhibits, key=itemgetter(0)):
+            workbook_stream = BytesIO()
+            count += write_exhibits_workbook(state_exhibits, workbook_stream, charts)
+            archive.writestr(f"{state}_Living_Wage_Exhibits.xlsx", workbook_stream.getvalue())
+    return count
@@ -0,0 +1,205 @@
+import csv
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+from geo import bounding_box, haversine_miles, within_miles
+
+# Persistent EIN -> (latitude, longitude) index, bucketed into a fixed lat/long grid
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'org_locations.sqlite')
+CELL_DEGREES = 0.25  # about 17 miles of latitude per cell
+CELLS_PER_ROW = int(360 / CELL_DEGREES)
+CELL_ROWS = int(180 / CELL_DEGREES)
+BATCH_SIZE = 50000
+MAX_GEOCODED_LOCATIONS = 100  # distinct places geocoded per add_frame; the most common places go first
+GEOCODE_TIME_BUDGET = 15  # seconds per add_frame; places missing from the gazetteer go to Nominatim at 1/s
+QUERY_CHUNK = 500  # EINs per IN (...) lookup, under SQLite's parameter limit
+
+
+def cell_row(lat):
+    return min(int((lat + 90) // CELL_DEGREES), CELL_ROWS - 1)
+
+
+def cell_column(lon):
+    return int(((lon + 180) % 360) // CELL_DEGREES)
+
+
+def cell_of(lat, lon):
+    # Cells are numbered row by row, so a run of longitudes within one latitude row is a single key range
+    return cell_row(lat) * CELLS_PER_ROW + cell_column(lon)
+
+
+def _cell_ranges(center, miles):
+    """Yield (first cell, last cell) key ranges covering the bounding box around center."""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(center[0], center[1], miles)
+    if max_lon - min_lon >= 360 - CELL_DEGREES:
+        column_ranges = [(0, CELLS_PER_ROW - 1)]
+    else:
+        first, last = cell_column(min_lon), cell_column(max_lon)
+        # A box across the antimeridian wraps around the end of the row
+        column_ranges = [(first, last)] if first <= last else [(first, CELLS_PER_ROW - 1), (0, last)]
+    for row in range(cell_row(min_lat), cell_row(max_lat) + 1):
+        for first, last in column_ranges:
+            yield row * CELLS_PER_ROW + first, row * CELLS_PER_ROW + last
+
+
+class LocationIndex:
+    """
+    Grid index over organization coordinates. A radius query only reads the cells under the
+    circle's bounding box, so its cost follows the area searched rather than the number of
+    organizations indexed. Organizations are added or moved one row at a time; nothing is rebuilt.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS org_locations (
+                    ein TEXT PRIMARY KEY,
+                    latitude REAL NOT NULL,
+                    longitude REAL NOT NULL,
+                    cell INTEGER NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+            # Covering index, so a cell range scan never goes back to the table
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_org_locations_cell ON org_locations (cell, latitude, longitude, ein)"
+            )
+
+    def add(self, records):
+        """
+        Insert or move (ein, latitude, longitude) records; rows without coordinates are skipped.
+        Returns the number of records stored.
+        """
+        count = 0
+        batch = []
+        for ein, lat, lon in records:
+            if ein is None or lat is None or lon is None or math.isnan(lat) or math.isnan(lon):
+                continue
+            batch.append((str(ein), float(lat), float(lon), cell_of(lat, lon)))
+            if len(batch) >= BATCH_SIZE:
+                self._insert(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self._insert(batch)
+            count += len(batch)
+        return count
+
+    def add_frame(self, df, ein_column, lat_column='latitude', lon_column='longitude',
+                  geocode=None, location_columns=(), max_locations=MAX_GEOCODED_LOCATIONS,
+                  time_budget=GEOCODE_TIME_BUDGET):
+        """
+        Index every row of a DataFrame that has coordinates. With geocode, rows without them
+        that are not indexed yet are placed by geocoding "city, state, zip" from the
+        (city, state, zip) location_columns, once per distinct place, until max_locations places
+        or time_budget seconds are used up. Returns the number of rows stored.
+        """
+        if ein_column not in df:
+            return 0
+        eins = df[ein_column].astype(str)
+        if {lat_column, lon_column} <= set(df.columns):
+            lats = df[lat_column].to_numpy(dtype=float, na_value=np.nan)
+            lons = df[lon_column].to_numpy(dtype=float, na_value=np.nan)
+            count = self.add(zip(eins, lats.tolist(), lons.tolist()))
+            unplaced = np.isnan(lats) | np.isnan(lons)
+        else:
+            count = 0
+            unplaced = np.ones(len(df), dtype=bool)
+        if geocode is not None and unplaced.any():
+            count += self._add_geocoded(df[unplaced], eins[unplaced], geocode, location_columns, max_locations, time_budget)
+        return count
+
+    def _add_geocoded(self, df, eins, geocode, location_columns, max_locations, time_budget):
+        if not location_columns or not set(location_columns) <= set(df.columns):
+            return 0
+        missing = ~eins.isin(self.indexed(eins)).to_numpy()
+        city, state, zip_code = (
+            df[column].astype('string').fillna('').str.strip().to_numpy(dtype=object)[missing] for column in location_columns
+        )
+        eins_by_place = {}
+        for ein, row in zip(eins[missing], zip(city, state, zip_code)):
+            # A state alone would put the organization at the middle of the state
+            if row[0] or row[2]:
+                eins_by_place.setdefault(', '.join(part for part in row if part), []).append(ein)
+        records = []
+        deadline = time.monotonic() + time_budget
+        for place in sorted(eins_by_place, key=lambda place: len(eins_by_place[place]), reverse=True)[:max_locations]:
+            coordinates = geocode(place)
+            if coordinates is not None:
+                records.extend((ein, coordinates[0], coordinates[1]) for ein in eins_by_place[place])
+            if time.monotonic() >= deadline:
+                break  # the rest are tried again on the next call
+        return self.add(records)
+
+    def indexed(self, eins):
+        """Return the set of eins that have a location."""
+        eins = list(dict.fromkeys(str(ein) for ein in eins))
+        found = set()
+        with self._lock:
+            for start in range(0, len(eins), QUERY_CHUNK):
+                chunk = eins[start:start + QUERY_CHUNK]
+                found.update(row[0] for row in self._connection.execute(
+                    f"SELECT ein FROM org_locations WHERE ein IN ({', '.join('?' * len(chunk))})", chunk
+                ))
+        return found
+
+    def load_file(self, path):
+        # CSV with ein, latitude and longitude columns
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            return self.add(
+                (record['ein'], float(record['latitude'] or 'nan'), float(record['longitude'] or 'nan'))
+                for record in csv.DictReader(f)
+            )
+
+    def _insert(self, batch):
+        with self._lock, self._connection:
+            self._connection.executemany(
+                """
+                INSERT INTO org_locations (ein, latitude, longitude, cell) VALUES (?, ?, ?, ?)
+                ON CONFLICT (ein) DO UPDATE SET
+                    latitude = excluded.latitude,
+                    longitude = excluded.longitude,
+                    cell = excluded.cell
+                """,
+                batch,
+            )
+
+    def nearby(self, center, miles):
+        """Return {ein: distance in miles} for every indexed organization within miles of center."""
+        rows = []
+        with self._lock:
+            for first, last in _cell_ranges(center, miles):
+                rows.extend(self._connection.execute(
+                    "SELECT ein, latitude, longitude FROM org_locations WHERE cell BETWEEN ? AND ?",
+                    (first, last),
+                ))
+        if not rows:
+            return {}
+        eins, lats, lons = zip(*rows)
+        lats, lons = np.array(lats), np.array(lons)
+        mask = within_miles(lats, lons, center, miles)
+        distances = haversine_miles(center[0], center[1], lats[mask], lons[mask])
+        return dict(zip(np.array(eins, dtype=object)[mask], distances.tolist()))
+
+    def count(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM org_locations").fetchone()[0]
+
+
+if __name__ == '__main__':
+    # python location_index.py org_locations.csv ...
+    index = LocationIndex()
+    for location_file in sys.argv[1:]:
+        print(f"{location_file}: {index.load_file(location_file)} organizations")
+    print(f"{index.count()} organizations indexed")
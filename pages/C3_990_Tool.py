@@ -1,229 +1,9 @@
 
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
-from lxml import etree
-import openpyxl
-from io import BytesIO
-from datetime import datetime
-# Function to fetch years and corresponding URLs for the given EIN
+# Year lookup, filing parsing and template filling are shared with the other 990 pages
+from form990 import fetch_years, fetch_data, edit_excel_template, clear_cache
 st.set_page_config(page_title='Nonprofit Search Tool', page_icon='C3_Only_Ball.png', layout='wide')
-def fetch_years(ein):
-    base_url = "https://projects.propublica.org"
-    url = f"{base_url}/nonprofits/organizations/{ein}"
-    response = requests.get(url)
-    years = {}
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        sections = soup.find_all("section", class_="single-filing-period")
-        for section in sections:
-            year = section['id'].replace("filing", "")
-            links = section.find_all("a", class_="btn")
-            xml_link = None
-            for link in links:
-                # Check if 'XML' is in the text, ignoring case
-                if 'xml' in link.text.lower():
-                    xml_link = link['href']
-                    break
-            if xml_link:
-                years[year] = base_url + xml_link  # Concatenate base_url with the href attribute
-                object_id = xml_link.split('object_id=')[-1]
-                detailed_url = f"{base_url}/nonprofits/download-xml?object_id={object_id}"
-                years[year] = (xml_link, detailed_url)
-            else:
-                years[year] = "XML link not found"  # Handle cases where no XML link is found
-    return years
-#helper function to extract text 
-#def get_text(soup, selector):
-    #element = soup.select_one(selector)
-    #return element.text.strip() if element else "Not Available"
-# Function to fetch detailed data from a URL associated with a selected year
-# Define namespaces for XML parsing
-ns = {'efile': 'http://www.irs.gov/efile'}
-def get_text(element, xpaths, namespaces):
-    """
-    Attempt to fetch data from a list of XPaths.
-    Returns the text from the first successful XPath query or "Not Available" if none match.
-    """
-    for xpath in xpaths:
-        result = element.xpath(xpath, namespaces=namespaces)
-        if result:
-            return result[0]  # Return the first result found
-    return "Not Available"
-# Fetch and parse organization and individual data
-def fetch_data(ein, detailed_url):
-    #url = full_url
-    
-    response = requests.get(detailed_url)
-    if response.status_code == 200:
-        tree = etree.fromstring(response.content)
-        
-        organization_data = {
-            'EIN': ein,
-            'Business Name': get_text(tree, ['//efile:Return/efile:ReturnHeader/efile:Filer/efile:BusinessName/efile:BusinessNameLine1Txt/text()'], ns),
-            'City': get_text(tree, ['//efile:Return/efile:ReturnHeader/efile:Filer/efile:USAddress/efile:CityNm/text()'], ns),
-            'State': get_text(tree, ['//efile:Return/efile:ReturnHeader/efile:Filer/efile:USAddress/efile:StateAbbreviationCd/text()'], ns),
-            'Fiscal Year End': get_text(tree, ['//efile:Return/efile:ReturnHeader/efile:TaxPeriodEndDt/text()'], ns),
-            'Total Assets EOY': get_text(tree, ['//efile:Return/efile:ReturnData/efile:IRS990/efile:TotalAssetsEOYAmt/text()', './/efile:FMVAssetsEOYAmt/text()'], ns),
-            'Total Expenses': get_text(tree, ['//efile:Return/efile:ReturnData/efile:IRS990/efile:CYTotalExpensesAmt/text()', './/efile:TotalExpensesRevAndExpnssAmt/text()'], ns),
-            'Total Revenue': get_text(tree, ['//efile:Return/efile:ReturnData/efile:IRS990/efile:CYTotalRevenueAmt/text()', './/efile:TotalRevAndExpnssAmt/text()'], ns), 
-            'Employee Count': get_text(tree, ['//efile:Return/efile:ReturnData/efile:IRS990/efile:TotalEmployeeCnt/text()'], ns)
-        }
-
-        fiscal_year_end_text = organization_data["Fiscal Year End"]
-        if "-" in fiscal_year_end_text:
-                fiscal_year_parts = fiscal_year_end_text.split("-")
-                if len(fiscal_year_parts) == 3:
-                    fiscal_year_month = int(fiscal_year_parts[1])
-                    fiscal_year_year = int(fiscal_year_parts[0])
-                    if fiscal_year_month == 12:
-                        w_year_end = fiscal_year_end_text
-                    else:
-                        w_year_end = f"{fiscal_year_year - 1}-12-31"
-                    organization_data["WYearEnd"] = w_year_end
-        #helper function
-        #def get_text(section, xpaths, namespaces):
-            # Accept xpaths as a list to handle multiple possible tags
-            #for xpath in xpaths:
-                #result = section.xpath(xpath, namespaces=namespaces)
-                #if result:
-                    #return result[0]  # Return the first result found
-            #return "Not Available"
-        # Parse individuals' data
-        individuals_data = []
-        part_j_sections = tree.xpath('//efile:Return/efile:ReturnData/efile:IRS990ScheduleJ/efile:RltdOrgOfficerTrstKeyEmplGrp', namespaces=ns)
-        for section in part_j_sections:
-            name = get_text(section, ['.//efile:PersonNm/text()', './/efile:BusinessNameLine1Txt/text()'], ns)
-            title = section.xpath('.//efile:TitleTxt/text()', namespaces=ns)[0] if section.xpath('.//efile:TitleTxt/text()', namespaces=ns) else "Not Available"
-            compensation_data = {
-                'Base Compensation': section.xpath('.//efile:BaseCompensationFilingOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:BaseCompensationFilingOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Bonus': section.xpath('.//efile:BonusFilingOrganizationAmount/text()', namespaces=ns)[0] if section.xpath('.//efile:BonusFilingOrganizationAmount/text()', namespaces=ns) else "Not Available",
-                'Other Compensation': section.xpath('.//efile:OtherCompensationFilingOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:OtherCompensationFilingOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Deferred Compensation': section.xpath('.//efile:DeferredCompensationFlngOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:DeferredCompensationFlngOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Nontaxable Benefits': section.xpath('.//efile:NontaxableBenefitsFilingOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:NontaxableBenefitsFilingOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Total Compensation': section.xpath('.//efile:TotalCompensationFilingOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:TotalCompensationFilingOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Reportable Compensation (Part VII)': section.xpath('.//efile:ReportableCompFromOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:ReportableCompFromOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Reportable Compensation From Rltd Org (Part VII)': section.xpath('.//efile:ReportableCompFromRltdOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:ReportableCompFromRltdOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Other Compensation (Part VII)': section.xpath('.//efile:OtherCompensationAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:OtherCompensationAmt/text()', namespaces=ns) else "Not Available",
-                'Avg Hr Per Week (Part VII) Test': section.xpath('.//efile:AverageHoursPerWeekRt/text()', namespaces=ns)[0] if section.xpath('.//efile:AverageHoursPerWeekRt/text()', namespaces=ns) else "Not Available",
-            }
-            individual_data = {'Name': name, 'Title': title}
-            individual_data.update(compensation_data)
-            individuals_data.append(individual_data)
-        
-        #schedule A
-        individuals_data2 = []
-        part_vii_sections = tree.xpath('//efile:Return/efile:ReturnData/efile:IRS990/efile:Form990PartVIISectionAGrp', namespaces=ns)
-        for section in part_vii_sections:
-            name = get_text(section, ['.//efile:PersonNm/text()', './/efile:BusinessNameLine1Txt/text()'], ns)
-            title = get_text(section, ['.//efile:TitleTxt/text()', './/efile:TitleTxt/text()'], ns)
-            compensation_data2 = {
-                'Reportable Compensation (Part VII)': section.xpath('.//efile:ReportableCompFromOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:ReportableCompFromOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Reportable Compensation From Rltd Org (Part VII)': section.xpath('.//efile:ReportableCompFromRltdOrgAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:ReportableCompFromRltdOrgAmt/text()', namespaces=ns) else "Not Available",
-                'Other Compensation (Part VII)': section.xpath('.//efile:OtherCompensationAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:OtherCompensationAmt/text()', namespaces=ns) else "Not Available",
-                'Avg Hr Per Week (Part VII)': section.xpath('.//efile:AverageHoursPerWeekRt/text()', namespaces=ns)[0] if section.xpath('.//efile:AverageHoursPerWeekRt/text()', namespaces=ns) else "Not Available",
-            }
-            individual_data2 = {'Name': name, 'Title': title}
-            individual_data2.update(compensation_data2)
-            individuals_data2.append(individual_data2)
-            
-        #990PF
-        individuals_data3 = []
-        part_pf_sections = tree.xpath('//efile:Return/efile:ReturnData/efile:IRS990PF/efile:OfficerDirTrstKeyEmplInfoGrp/efile:OfficerDirTrstKeyEmplGrp', namespaces=ns)
-        for section in part_pf_sections:
-            name = get_text(section, ['.//efile:PersonNm/text()', './/efile:BusinessNameLine1Txt/text()'], ns)
-            title = get_text(section, ['.//efile:TitleTxt/text()'], ns)
-            compensation_data3 = {
-                'Reportable Compensation (PF)': section.xpath('.//efile:CompensationAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:CompensationAmt/text()', namespaces=ns) else "Not Available",
-                'Employee Benefit Amount (PF)': section.xpath('.//efile:EmployeeBenefitProgramAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:EmployeeBenefitProgramAmt/text()', namespaces=ns) else "Not Available",
-                'Other Compensation (PF)': section.xpath('.//efile:ExpenseAccountOtherAllwncAmt/text()', namespaces=ns)[0] if section.xpath('.//efile:ExpenseAccountOtherAllwncAmt/text()', namespaces=ns) else "Not Available",
-                'Avg Hr Per Week (PF)': section.xpath('.//efile:AverageHrsPerWkDevotedToPosRt/text()', namespaces=ns)[0] if section.xpath('.//efile:AverageHrsPerWkDevotedToPosRt/text()', namespaces=ns) else "Not Available",
-            }
-            individual_data3 = {'Name': name, 'Title': title}
-            individual_data3.update(compensation_data3)
-            individuals_data3.append(individual_data3)
-        #return {'organization_data': organization_data, 'individuals_data': individuals_data, 'individuals_data2': individual_data2}
-    #else:
-        #return {'organization_data': {}, 'individuals_data': [], 'individuals_data2': []}
-        # Combine all individual data
-        combined_individuals_data = individuals_data + individuals_data2 + individuals_data3
-        unique_individuals = {individual['Name']: individual for individual in combined_individuals_data}.values()
-
-        # Update individual records with merged data
-        final_individuals_data = []
-        for individual in unique_individuals:
-            merged_data = {}
-            for dataset in [individuals_data, individuals_data2, individuals_data3]:
-                for data in dataset:
-                    if data['Name'] == individual['Name']:
-                        merged_data.update(data)
-            final_individuals_data.append(merged_data)
-
-        return {'organization_data': organization_data, 'individuals_data': final_individuals_data}
-# Streamlit UI components
-
-def edit_excel_template(data, template_path):
-    def to_number(value):
-        try:
-            return float(value)
-        except ValueError:
-            return value
-    def to_proper_case(text):
-        return text.title()
-    def to_date(value, date_format="%Y-%m-%d"):
-        try:
-            return datetime.strptime(value, date_format)
-        except ValueError:
-            return value
-    workbook = openpyxl.load_workbook(template_path)
-    sheet = workbook["Form 990 - Position Title"]  # Assumes that the sheet name is "Template"
-    sheet2 = workbook["PEER GROUP"]
-    #sheet3 = workbook["Form 990F - Position Title"]
-    sheet4 = workbook["Form 990PF - Position Title"]
-    row = 6
-    for entry in data:
-        sheet2[f"B{row}"] = to_proper_case(entry["Organization_Name"])
-        sheet2[f"C{row}"] = to_number(entry["EIN"])
-        sheet2[f"F{row}"] = to_proper_case(entry["City"]) 
-        sheet2[f"G{row}"] = entry["State"]
-        sheet2[f"E{row}"] = to_date(entry["W2E"])
-        sheet2[f"D{row}"] = to_date((entry["Fiscal_Year_End"]))
-        sheet2[f"H{row}"] = to_number(entry["Total Assets"])
-        sheet2[f"I{row}"] = to_number(entry["Total Expenses"])
-        sheet2[f"J{row}"] = to_number(entry["Total Revenue"])
-        sheet2[f"N{row}"] = to_number(entry["Employee Count"])
-
-        sheet[f"H{row}"] = to_proper_case(entry["Employee_Name"])
-        sheet[f"I{row}"] = to_proper_case(entry["Title_Of_Position"])
-        sheet[f"P{row}"] = to_number(entry["Base Compensation"])
-        sheet[f"T{row}"] = to_number(entry["Deferred Compensation"])
-        sheet[f"S{row}"] = to_number(entry["Other Compensation"])
-        sheet[f"U{row}"] = to_number(entry["Nontaxable Benefits"])
-        #sheet[f"S{row}"] = to_number(entry["Total Compensation"])
-        sheet[f"Q{row}"] = to_number(entry["Bonus"])
-
-        #sheet4[f"B{row}"] = to_proper_case(entry["Organization_Name"])
-        #sheet4[f"C{row}"] = to_number(entry["EIN"])
-        #sheet4[f"F{row}"] = to_proper_case(entry["City"]) 
-        #sheet4[f"G{row}"] = entry["State"]
-        #sheet4[f"E{row}"] = format_date(entry["W2E"])
-        #sheet4[f"D{row}"] = format_date(entry["Fiscal_Year_End"])
-        #sheet4[f"J{row}"] = to_number(entry["Total Assets"])
-        #sheet4[f"K{row}"] = to_number(entry["Total Expenses"])
-        #sheet4[f"J{row}"] = to_number(entry["Total Revenue"])
-        #sheet4[f"L{row}"] = to_number(entry["Employee Count"])
-        sheet4[f"H{row}"] = to_proper_case(entry["Employee_Name"])
-        sheet4[f"I{row}"] = to_proper_case(entry["Title_Of_Position"])
-        sheet4[f"O{row}"] = to_number(entry["Reportable Comp PF"])
-        sheet4[f"P{row}"] = to_number(entry["Benefits Comp PF"])
-        sheet4[f"Q{row}"] = to_number(entry["Expenses and Other Comp PF"])
-        
-        row += 1
-    edited_file = BytesIO()
-    workbook.save(edited_file)
-    edited_file.seek(0)  # Move the cursor to the start of the stream
-    return edited_file
 
 # Streamlit UI components
 banner_path = 'Horizontal_Banner_NoSC.png'
@@ -251,8 +31,9 @@ for i in range(num_orgs):
         col1, col2 = st.columns(2)
         ein = col1.text_input(f"Enter EIN {i+1}", key=f"ein_{i}")
         
-        if ein.strip() and not st.session_state['year_data'][str(i)]:
-            st.session_state['year_data'][str(i)] = fetch_years(ein)
+        # fetch_years is memoized across sessions, so looking it up on every rerun is a memory read
+        # and a changed EIN picks up its own years
+        st.session_state['year_data'][str(i)] = fetch_years(ein) if ein.strip() else {}
         
         if st.session_state['year_data'][str(i)]:
             years = list(st.session_state['year_data'][str(i)].keys())
@@ -353,3 +134,7 @@ if st.button("Generate Final Output Chart", key='generate_chart_button'):
 if st.button("Reset", key='reset_button'):
     st.session_state.clear()
     st.experimental_rerun()
+# Drop the year lists and filings memoized for every session, so the next lookup goes back to ProPublica
+if st.button("Refresh Cached 990 Data", key='refresh_cache_button'):
+    clear_cache()
+    st.experimental_rerun()
@@ -1,30 +1,38 @@
 import altair as alt
 import streamlit as st
-import openpyxl
 import pandas as pd
 import streamlit_shadcn_ui as ui
 from io import BytesIO
-
-# Assuming 'path_to_file.xlsx' is the correct path to your Excel file
-file_path = 'fbc_data_2024_V1.2.xlsx'
+from excel_templates import load_template
+from living_wage_data import AreaIndex, WageVariants, load_sheet
+from living_wage_export import iter_exhibits, write_exhibits_workbook, write_exhibits_zip
 
 st.set_page_config(page_title='Living Wage Dashboard', page_icon='C3_Only_Ball.png', layout='wide')
 
-
+# Columns never shown in the dashboard, so they are never read from the store
+columns_to_exclude = ['case_id', 'top100', 'num_counties_in_st', 'st_cost_rank', 'st_med_aff_rank', 'st_income_rank', 'top100_cost_rank', 'top100_med_faminc_rank', 'top100_med_aff_rank', 'county_fips', 'median_family_income', 'family']
 
 
 # Function to load data
 @st.cache_data
 def load_data(sheet_name):
-    # Using the `header` parameter to specify which row contains column names
-    # `engine='openpyxl'` is specified since the default engine might not handle '.xlsm' correctly
-    data = pd.read_excel(file_path, sheet_name=sheet_name, header=0, engine='openpyxl')  
-    data = data.dropna(axis='columns', how='all')  # Drop columns with all NaN values
-    return data
+    # Reads the Parquet copy of fbc_data_2024_V1.2.xlsx; the workbook is only parsed when it changes
+    return load_sheet(sheet_name, exclude=columns_to_exclude)
+
+# Built once per process and shared across sessions, so it is a resource rather than data
+@st.cache_resource
+def load_area_index(sheet_name, area_column):
+    return AreaIndex(load_data(sheet_name), area_column)
+
+@st.cache_resource
+def load_wage_variants(sheet_name):
+    return WageVariants(load_data(sheet_name))
 
 # Load the County and Metro datasets
-county_data = load_data('County_Annual')  # Update with the correct sheet name for County data
-metro_data = load_data('Metro_Annual')  # Update with the correct sheet name for Metro data
+county_index = load_area_index('County_Annual', 'County')  # Update with the correct sheet name for County data
+metro_index = load_area_index('Metro_Annual', 'Areaname')  # Update with the correct sheet name for Metro data
+county_wages = load_wage_variants('County_Annual')
+metro_wages = load_wage_variants('Metro_Annual')
 
 
 
@@ -57,7 +65,7 @@ col1, col2 = st.columns([2, 2])  # Here, col1 is three times wider than col2
 # Filter selection sidebar
 with st.sidebar:
     data_type = st.radio("Selected Data Type:", ["Metro"], index=0)
-    selected_state = st.selectbox("Select State", county_data['State abv.'].unique())
+    selected_state = st.selectbox("Select State", county_index.states())
     use_default_filters = st.checkbox("Default Providers and Dependents")
     
     if use_default_filters:
@@ -86,38 +94,22 @@ with st.sidebar:
     ######
 
 # Based on data type, load the appropriate area data
-if data_type == "County":
-    areas = county_data[county_data['State abv.'] == selected_state]['County'].unique()
-else:
-    areas = metro_data[metro_data['State abv.'] == selected_state]['Areaname'].unique()
+area_index, wage_variants = (county_index, county_wages) if data_type == "County" else (metro_index, metro_wages)
 
-sorted_areas = sorted(areas)
+sorted_areas = area_index.areas(selected_state)
 selected_area = st.selectbox(f"Select {data_type} Area", sorted_areas)
 
 #selected_area = st.selectbox(f"Select {data_type} Area", areas)
 
 # Filter the data based on selections
-if data_type == "County":
-    filtered_data = county_data[
-        (county_data['State abv.'] == selected_state) & 
-        (county_data['County'] == selected_area) &
-        (county_data['Provider'].isin(provider_filter)) &
-        (county_data['Dependent'].isin(dependents_filter))  # Make sure 'Dependents' matches your data column
-    ]
-else:
-    filtered_data = metro_data[
-        (metro_data['State abv.'] == selected_state) & 
-        (metro_data['Areaname'] == selected_area) &
-        (metro_data['Provider'].isin(provider_filter)) &
-        (metro_data['Dependent'].isin(dependents_filter))  # Make sure 'Dependents' matches your data column
-    ]
-
-# Calculate the total for selected monetary columns
-if selected_monetary_columns:
-    filtered_data['Total'] = filtered_data[selected_monetary_columns].astype(float).sum(axis=1)
+selected_rows = area_index.positions(selected_state, selected_area, provider_filter, dependents_filter)
+filtered_data = area_index.data.iloc[selected_rows]
+
+# Totals for the selected monetary columns are precomputed for every row; only this area's rows are sliced out
+wage_totals = wage_variants.totals(selected_monetary_columns).iloc[selected_rows]
+filtered_data = filtered_data.assign(Total=wage_totals['Living'])
 
 # Exclude certain columns from the final output
-columns_to_exclude = ['case_id', 'top100', 'num_counties_in_st', 'st_cost_rank', 'st_med_aff_rank', 'st_income_rank', 'top100_cost_rank', 'top100_med_faminc_rank', 'top100_med_aff_rank', 'county_fips', 'median_family_income', 'family']
 columns_to_include = [col for col in filtered_data.columns if col not in columns_to_exclude]
 final_output = filtered_data[columns_to_include]
 
@@ -136,12 +128,10 @@ st.dataframe(final_output)
 
 # Apply a 20% Healthcare credit and recalculate the total
 if 'Healthcare' in final_output.columns:
-    healthcare_credit_df = final_output.copy()
-    healthcare_credit_df['Healthcare'] *= 0.20  # Apply the 20% credit
-
-    # Check if 'Total' needs to be recalculated
-    if 'Total' in healthcare_credit_df.columns and 'Healthcare' in selected_monetary_columns:
-        healthcare_credit_df['Total'] = healthcare_credit_df[selected_monetary_columns].astype(float).sum(axis=1)
+    healthcare_credit_df = final_output.assign(
+        Healthcare=wage_variants.credited_healthcare.iloc[selected_rows],  # Apply the 20% credit
+        Total=wage_totals['Healthcare Credit'],
+    )
 
     # Display the new Living Wage table with Healthcare credit
     #<span style='font-size: 20px;'>🟢</span> <!-- Emoji with larger font size -->
@@ -154,13 +144,8 @@ if 'Healthcare' in final_output.columns:
     st.dataframe(healthcare_credit_df)
 
 if 'Other Necessities ' in healthcare_credit_df.columns:
-    thriving_wage_df = healthcare_credit_df.copy()
-    thriving_wage_df['Other Necessities '] *= 2  # Double the values in 'Other Necessities'
-
-    # Check if 'Total' needs to be recalculated
-    if 'Total' in thriving_wage_df.columns:
-        # Only include the selected monetary columns for the new total
-        thriving_wage_df['Total'] = thriving_wage_df[selected_monetary_columns].astype(float).sum(axis=1)
+    thriving_wage_df = healthcare_credit_df.assign(Total=wage_totals['Thriving'])
+    thriving_wage_df['Other Necessities '] = wage_variants.thriving_other.iloc[selected_rows]  # Double the values in 'Other Necessities'
 
     # Display the new Thriving Wage table
     #<span style='font-size: 20px;'>🟢</span> <!-- Emoji with larger font size -->
@@ -240,7 +225,7 @@ st.altair_chart(grouped_bar_chart, use_container_width=True)
 st.dataframe(comparison_df)
 
 def save_and_load_excel():
-    workbook = openpyxl.load_workbook('Living_Wage_Template.xlsx')
+    workbook = load_template('Living_Wage_Template.xlsx')
     sheet = workbook["LW_TW_Exhibit"]
     
     merged_cells_ranges = list(sheet.merged_cells.ranges)
@@ -286,4 +271,28 @@ if st.button('Save Changes to Excel'):
         data=modified_excel,
         file_name="Modified_Living_Wage_Template.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
\ No newline at end of file
+    )
+
+# Bulk export: one exhibit sheet per area for every selected state
+st.markdown("""
+    <h1 style='font-weight: normal; font-size: 30px;'>
+        Bulk Export
+    </h1>
+    """, unsafe_allow_html=True)
+bulk_states = st.multiselect("Select States to Export", area_index.states(), default=[state for state in [selected_state] if state in area_index.states()])
+bulk_format = st.radio("Export Format", ["One Workbook", "ZIP (One Workbook per State)"], horizontal=True)
+include_charts = st.checkbox("Include Charts", value=True)
+
+if st.button('Export All Areas'):
+    exhibits = iter_exhibits(area_index, wage_variants, bulk_states, selected_monetary_columns, provider_filter, dependents_filter)
+    bulk_stream = BytesIO()
+    with st.spinner("Writing exhibits..."):
+        if bulk_format == "One Workbook":
+            area_count = write_exhibits_workbook(exhibits, bulk_stream, charts=include_charts)
+            file_name, mime = "Living_Wage_Exhibits.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        else:
+            area_count = write_exhibits_zip(exhibits, bulk_stream, charts=include_charts)
+            file_name, mime = "Living_Wage_Exhibits.zip", "application/zip"
+    bulk_stream.seek(0)
+    st.caption(f"{area_count} {data_type} areas exported.")
+    st.download_button(label="Download Exhibits", data=bulk_stream, file_name=file_name, mime=mime)
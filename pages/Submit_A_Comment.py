@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
+from comment_store import PAGE_SIZE, SORT_ORDERS, CommentStore
 
 
 
@@ -17,21 +17,13 @@ STATUS_OPTIONS = {
     "Not Reviewed": "❔"
 }
 
-# Path to the Excel file
-excel_file_path = 'comments.xlsx'
+# One store per process; comments.xlsx is imported into it the first time it is opened
+@st.cache_resource
+def get_comment_store():
+    return CommentStore()
 
-# Load or initialize the comments DataFrame
-try:
-    comments_df = pd.read_excel(excel_file_path)
-except FileNotFoundError:
-    comments_df = pd.DataFrame(columns=['ID', 'Timestamp', 'Name', 'Comment', 'Replies', 'Upvotes', 'Status'])
-
-
-comments_df['Replies'] = comments_df['Replies'].astype(str)
-
-# Function to save DataFrame to Excel
-def save_comments(df):
-    df.to_excel(excel_file_path, index=False)
+comment_store = get_comment_store()
+comment_ids = comment_store.ids()
 
 # Layout for adding new comments and replying to existing ones
 col1, col2 = st.columns(2)
@@ -41,49 +33,45 @@ with col1:  # Column for adding a new comment
         comment = st.text_area("Leave a comment or question:")
         submit_comment = st.form_submit_button('Submit Comment')
     if submit_comment and comment:
-        new_id = len(comments_df) + 1 if not comments_df.empty else 1
-        new_comment = {
-            'ID': new_id,
-            'Timestamp': datetime.now(),  # Store the full datetime
-            'Name': name,
-            'Comment': comment,
-            'Replies': '',  # Initialize as an empty string
-            'Upvotes': 0,
-            'Status': STATUS_OPTIONS['Not Reviewed']
-        }
-        comments_df = comments_df.append(new_comment, ignore_index=True)
-        save_comments(comments_df)
+        comment_store.add_comment(name, comment, STATUS_OPTIONS['Not Reviewed'])
+        comment_ids = comment_store.ids()
 
 with col2:  # Column for replying to an existing comment
-    if not comments_df.empty:
-        comment_to_reply_id = st.selectbox('Select a comment to reply to:', comments_df['ID'])
+    if comment_ids:
+        comment_to_reply_id = st.selectbox('Select a comment to reply to:', comment_ids)
         with st.form('reply_form'):
             reply_name = st.text_input("Your name (for reply):")
             reply_text = st.text_area("Write your reply:")
             submit_reply = st.form_submit_button('Submit Reply')
         if submit_reply and reply_text and reply_name:
-            comment_index = comments_df.index[comments_df['ID'] == comment_to_reply_id].tolist()[0]
-            # Ensure existing replies is a string before appending
-            existing_replies = comments_df.at[comment_index, 'Replies']
-            existing_replies = existing_replies if existing_replies != 'nan' else ''
-            new_reply = f"{reply_name}: {reply_text}\n"
-            comments_df.at[comment_index, 'Replies'] = existing_replies + new_reply
-            save_comments(comments_df)
+            comment_store.add_reply(comment_to_reply_id, reply_name, reply_text)
 # Layout for changing status of comments
 with st.form('status_form'):
     col1, col2 = st.columns(2)
     with col1:
-        comment_to_change_status_id = st.selectbox('Select a comment to change status:', comments_df['ID'], key='status_id')
+        comment_to_change_status_id = st.selectbox('Select a comment to change status:', comment_ids, key='status_id')
     with col2:
         status_to_change = st.selectbox("Change Status", list(STATUS_OPTIONS.keys()), key='status_select')
         submit_status = st.form_submit_button('Update Status')
     if submit_status:
-        comment_index = comments_df.index[comments_df['ID'] == comment_to_change_status_id].tolist()[0]
-        comments_df.at[comment_index, 'Status'] = STATUS_OPTIONS[status_to_change]
-        save_comments(comments_df)
+        comment_store.set_status(comment_to_change_status_id, STATUS_OPTIONS[status_to_change])
 
 # Display the comments and replies
 st.write("## Comments and Replies")
+filter_col, sort_col, page_col = st.columns(3)
+with filter_col:
+    status_filter = st.selectbox("Filter by Status", ["All"] + list(STATUS_OPTIONS.keys()), key='feed_status')
+with sort_col:
+    sort_order = st.selectbox("Sort by", list(SORT_ORDERS.keys()), key='feed_sort')
+status_value = STATUS_OPTIONS.get(status_filter)  # None for "All"
+comment_count = comment_store.count(status_value)
+page_count = max(1, -(-comment_count // PAGE_SIZE))
+with page_col:
+    page_number = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1, key='feed_page')
+
+# Only the visible page is queried and rendered
+comments_df = comment_store.page(page_number, PAGE_SIZE, status_value, sort_order)
+st.caption(f"Showing {len(comments_df)} of {comment_count} comments")
 for index, row in comments_df.iterrows():
     cols = st.columns([3, 2])
     with cols[0]:  # Display comment info, upvotes and delete button
@@ -94,15 +82,14 @@ for index, row in comments_df.iterrows():
         st.write(f"Status: {row['Status']}")
         upvote_button, delete_button = st.columns([1, 1])
         with upvote_button:
-            if st.button('👍 Upvote', key=f"upvote_{index}"):
-                comments_df.at[index, 'Upvotes'] += 1
-                save_comments(comments_df)
+            if st.button('👍 Upvote', key=f"upvote_{row['ID']}"):
+                comment_store.upvote(row['ID'])
+                st.rerun()
             st.write(f"Upvotes: {row['Upvotes']}")
         with delete_button:
-            if st.button('Delete', key=f"delete_{index}"):
-                comments_df = comments_df.drop(index)
-                comments_df.reset_index(drop=True, inplace=True)
-                save_comments(comments_df)
+            if st.button('Delete', key=f"delete_{row['ID']}"):
+                comment_store.delete(row['ID'])
+                st.rerun()
     with cols[1]:  # Display replies
         st.write("**Replies:**")
         # Check if 'Replies' is not NaN before attempting to split
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+# Candidate column, comparison organization field and display flag for each size measure
+SIZE_FEATURES = {
+    'assets': ('totassetsend', 'within_assets_range'),
+    'revenue': ('totrevenue', 'within_revenue_range'),
+    'expenses': ('totfuncexpns', 'within_expenses_range'),
+    'employees': ('employees', 'within_employees_range'),
+}
+DEFAULT_WEIGHTS = {'assets': 1, 'revenue': 1, 'expenses': 1, 'employees': 1, 'state': 1, 'ntee': 1}
+RANGE_FACTOR = 2  # "within range" means between half and double the target, as before
+ZERO_SIMILARITY_FACTOR = 4  # size similarity falls linearly to 0 at four times (or a quarter of) the target
+
+
+def _numeric(df, column):
+    if column not in df:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)
+
+
+def _target_value(organization, field):
+    value = pd.to_numeric(organization.get(field), errors='coerce')
+    return 0.0 if pd.isna(value) else float(value)
+
+
+def _text(df, column):
+    if column not in df:
+        return pd.Series('', index=df.index)
+    return df[column].fillna('').astype(str).str.upper()
+
+
+def score_peers(df, comparison_org, weights=None):
+    """
+    Add similarity columns to df for every candidate at once and return it.
+    Size measures are compared on a log scale; state scores 1 on a match, and NTEE scores
+    1 for the same code and 0.5 for the same major group. 'score' is the weighted mean in [0, 1].
+    The within_*_range, same_state and matches columns keep their previous meaning.
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    df = df.copy()
+    total = np.zeros(len(df))
+    matches = np.zeros(len(df), dtype=int)
+    for feature, (column, flag) in SIZE_FEATURES.items():
+        values = _numeric(df, column)
+        target = _target_value(comparison_org, column)
+        with np.errstate(invalid='ignore'):
+            in_range = (values >= target / RANGE_FACTOR) & (values <= target * RANGE_FACTOR)
+            distance = np.abs(np.log1p(np.clip(values, 0, None)) - np.log1p(max(target, 0)))
+        similarity = np.clip(1 - distance / np.log(ZERO_SIMILARITY_FACTOR), 0, 1)
+        total += weights[feature] * np.nan_to_num(similarity, nan=0.0)
+        df[flag] = in_range
+        matches += in_range
+
+    states = _text(df, 'state')
+    same_state = (states == str(comparison_org.get('state') or '').upper()).to_numpy()
+    df['same_state'] = same_state
+    matches += same_state
+    total += weights['state'] * same_state
+
+    target_ntee = str(comparison_org.get('ntee_code') or '').upper()
+    if target_ntee:
+        ntee = _text(df, 'ntee_code')
+        same_code = (ntee == target_ntee).to_numpy()
+        same_major = (ntee.str[:1] == target_ntee[:1]).to_numpy()
+        total += weights['ntee'] * np.where(same_code, 1.0, np.where(same_major, 0.5, 0.0))
+        weight_sum = sum(weights.values())
+    else:
+        weight_sum = sum(weight for name, weight in weights.items() if name != 'ntee')
+
+    df['matches'] = matches
+    df['score'] = total / weight_sum if weight_sum else total
+    return df
+
+
+def top_k(scores, k=None):
+    """Positions of the k highest scores, best first; argpartition keeps this linear in the candidate count."""
+    scores = np.asarray(scores)
+    if k is None or k >= len(scores):
+        return np.argsort(-scores, kind='stable')
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def rank_peers(df, comparison_org, k=None, weights=None):
+    """Score every candidate and return the k best (all of them if k is None), highest score first."""
+    scored = score_peers(df, comparison_org, weights)
+    return scored.iloc[top_k(scored['score'].to_numpy(), k)]
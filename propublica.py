@@ -0,0 +1,160 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from urllib.parse import urlparse, parse_qs
+
+import http_session
+from filing_cache import FilingCache
+from filing_index import FilingIndex
+
+BASE_URL = "https://projects.propublica.org"
+SEARCH_URL = f"{BASE_URL}/nonprofits/api/v2/search.json"
+
+# One cache per process so every page and every session share downloaded filings
+filing_cache = FilingCache()
+filing_index = FilingIndex()
+
+
+def get_object_id(detailed_url):
+    query = parse_qs(urlparse(detailed_url).query)
+    if 'object_id' in query:
+        return query['object_id'][0]
+    return detailed_url.split('object_id=')[-1]
+
+
+def get_filing_links(object_id):
+    xml_link = f"/nonprofits/download-xml?object_id={object_id}"
+    return xml_link, f"{BASE_URL}{xml_link}"
+
+
+def lookup_years(ein):
+    """
+    Return {year: (xml_link, detailed_url)} for an EIN from the local filing index,
+    in the same shape fetch_years scrapes from ProPublica. Empty if the EIN is not indexed.
+    """
+    return {tax_year: get_filing_links(object_id) for tax_year, object_id, _ in filing_index.lookup(ein)}
+
+
+def is_filing(head):
+    # Only keep real filings; an HTML error page must not be served forever
+    return b'<Return' in head
+
+
+def open_filing_xml(detailed_url):
+    """
+    Return a readable stream over a filing's XML, or None if ProPublica does not return it.
+    Cached filings are read from disk; otherwise the response body is streamed and
+    written into the cache as it is consumed, so the payload is never held in memory.
+    """
+    object_id = get_object_id(detailed_url)
+    stream = filing_cache.open(object_id)
+    if stream is not None:
+        return stream
+    response = http_session.get(detailed_url, stream=True)
+    if response.status_code != 200:
+        response.close()
+        return None
+    response.raw.decode_content = True
+    return filing_cache.tee(object_id, response.raw, accept=is_filing)
+
+
+def select_filings(year_data, num_years):
+    """Return (year, detailed_url) for the most recent num_years filings that have an XML link."""
+    recent_years = sorted(year_data.keys(), reverse=True)[:num_years]
+    return [(year, year_data[year][1]) for year in recent_years if isinstance(year_data[year], tuple)]
+
+
+def fetch_filings(eins, fetch_years, fetch_data, num_years=1, max_workers=8, on_progress=None):
+    """
+    Fetch the most recent num_years filings for every EIN on a bounded thread pool.
+    Year discovery and XML downloads are pipelined: an EIN's filings are queued as soon
+    as its years are known, while other EINs are still being looked up.
+
+    Returns one dict per EIN in input order with 'years' (the fetch_years result),
+    'filings' (a list of (year, fetch_data result)) and 'error' (the first exception, or None).
+    on_progress(done, total) is called from the calling thread each time an EIN finishes,
+    so it is safe to update Streamlit elements from it.
+    """
+    results = [{'years': {}, 'filings': [], 'error': None} for _ in eins]
+    remaining = {}
+    done_count = 0
+    if not eins:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {pool.submit(fetch_years, ein): (i, None) for i, ein in enumerate(eins)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, slot = pending.pop(future)
+                result = results[i]
+                if slot is None:
+                    # Year discovery finished, queue this EIN's downloads
+                    try:
+                        result['years'] = future.result()
+                        selected = select_filings(result['years'], num_years)
+                    except Exception as e:
+                        result['error'] = e
+                        selected = []
+                    remaining[i] = len(selected)
+                    for filing_slot, (year, detailed_url) in enumerate(selected):
+                        result['filings'].append((year, None))
+                        pending[pool.submit(fetch_data, eins[i], detailed_url)] = (i, filing_slot)
+                else:
+                    year = result['filings'][slot][0]
+                    try:
+                        fetched_data = future.result()
+                        if fetched_data is None:
+                            raise ValueError(f"Filing for {year} could not be downloaded")
+                        result['filings'][slot] = (year, fetched_data)
+                    except Exception as e:
+                        if result['error'] is None:
+                            result['error'] = e
+                    remaining[i] -= 1
+
+                if remaining[i] == 0:
+                    done_count += 1
+                    if on_progress:
+                        on_progress(done_count, len(eins))
+    return results
+
+
+def fetch_search_page(params, page):
+    """Return one page of search.json results; raises if ProPublica does not return it."""
+    response = http_session.get(SEARCH_URL, params={**params, 'page': page})
+    if response.status_code != 200:
+        raise ValueError(f"Search page {page} failed with status {response.status_code}")
+    return response.json()
+
+
+def search_organizations(params, max_workers=8, max_pages=None):
+    """
+    Yield every page of a search.json query as it arrives, each with an added 'error' key.
+    Page 0 is fetched first to learn num_pages; the remaining pages are fetched concurrently
+    (rate limited by http_session) and yielded in completion order, not page order.
+    A page that fails is yielded with no organizations and the exception in 'error'.
+    """
+    try:
+        first_page = fetch_search_page(params, 0)
+    except Exception as e:
+        yield {'cur_page': 0, 'organizations': [], 'error': e}
+        return
+    first_page['error'] = None
+    yield first_page
+
+    num_pages = first_page.get('num_pages') or 1
+    if max_pages is not None:
+        num_pages = min(num_pages, max_pages)
+    if num_pages <= 1:
+        return
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {pool.submit(fetch_search_page, params, page): page for page in range(1, num_pages)}
+        for future in as_completed(futures):
+            try:
+                page_data = future.result()
+                page_data['error'] = None
+            except Exception as e:
+                page_data = {'cur_page': futures[future], 'organizations': [], 'error': e}
+            yield page_data
+    finally:
+        # Stop queued page requests if the caller stops reading early
+        pool.shutdown(wait=False, cancel_futures=True)
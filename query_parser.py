@@ -0,0 +1,79 @@
+import re
+import threading
+
+# Natural-language search parsing for the peer group finder.
+# Simple queries are handled by rules; flan-t5 is only loaded for queries the rules can't read.
+MODEL_NAME = "google/flan-t5-small"
+MAX_LENGTH = 50
+BATCH_SIZE = 16
+PROMPT = "Extract the place name from this search. Answer with only the place. Search: {}"
+
+RADIUS_PATTERN = re.compile(r'\bwithin\s+(\d+(?:\.\d+)?)\s*(?:mi|miles?)\b(?:\s+(?:of|from|around)\s+(.+))?', re.IGNORECASE)
+ZIP_PATTERN = re.compile(r'\b(\d{5})(?:-\d{4})?\b')
+STATE_PATTERN = re.compile(r'\bstate\s+([A-Za-z]{2})\b', re.IGNORECASE)
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """Return the process-wide (tokenizer, model), loading them on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                # Imported here so pages that never parse free text don't pay for transformers either
+                from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+                tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+                model = AutoModelForSeq2SeqLM.from_pretrained(MODEL_NAME)
+                model.eval()
+                _model = (tokenizer, model)
+    return _model
+
+
+def generate(prompts):
+    """Run the model over prompts in batches and return the decoded outputs in order."""
+    import torch
+
+    tokenizer, model = get_model()
+    outputs = []
+    for start in range(0, len(prompts), BATCH_SIZE):
+        inputs = tokenizer(prompts[start:start + BATCH_SIZE], return_tensors="pt", padding=True)
+        with torch.inference_mode():
+            generated = model.generate(**inputs, max_length=MAX_LENGTH)
+        outputs.extend(tokenizer.batch_decode(generated, skip_special_tokens=True))
+    return outputs
+
+
+def parse_rules(user_input):
+    """Filters read directly from the text, or None when the text needs the model."""
+    filters = {}
+    if "location" in user_input:
+        filters['location'] = user_input.split("location")[1].strip()
+    radius = RADIUS_PATTERN.search(user_input)
+    if radius:
+        filters['proximity'] = float(radius.group(1))
+        if radius.group(2) and 'location' not in filters:
+            filters['location'] = radius.group(2).strip()
+    zip_code = ZIP_PATTERN.search(user_input)
+    if zip_code:
+        filters['zip_code'] = zip_code.group(1)
+    state = STATE_PATTERN.search(user_input)
+    if state:
+        filters['state'] = state.group(1).upper()
+    return filters or None
+
+
+def parse_user_inputs(user_inputs):
+    """Parse several queries; the ones the rules can't handle share batched model calls."""
+    results = [{} if not user_input.strip() else parse_rules(user_input) for user_input in user_inputs]
+    pending = [i for i, filters in enumerate(results) if filters is None]
+    if pending:
+        answers = generate([PROMPT.format(user_inputs[i]) for i in pending])
+        for i, answer in zip(pending, answers):
+            results[i] = {'location': answer.strip()} if answer.strip() else {}
+    return results
+
+
+def parse_user_input(user_input):
+    return parse_user_inputs([user_input])[0]
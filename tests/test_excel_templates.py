@@ -0,0 +1,82 @@
+from copy import copy
+from io import BytesIO
+
+import openpyxl
+import pytest
+from openpyxl.cell.cell import MergedCell
+
+from excel_templates import MergedCellIndex, insert_rows_with_formatting, load_template
+
+TEMPLATES = ['990Template2.xlsm', '990TemplateNew.xlsm', 'Living_Wage_Template.xlsx']
+
+
+def saved(workbook):
+    stream = BytesIO()
+    workbook.save(stream)
+    return openpyxl.load_workbook(BytesIO(stream.getvalue()))
+
+
+def cell_style(cell):
+    # copy() unwraps openpyxl's style proxies into comparable style objects
+    return (cell.number_format, *map(copy, (cell.font, cell.fill, cell.border, cell.alignment, cell.protection)))
+
+
+def snapshot(workbook):
+    sheets = {}
+    styles = {}  # a workbook has a few hundred distinct styles, resolve each once
+    for sheet in workbook.worksheets:
+        cells = {}
+        for cell in sheet._cells.values():
+            style_key = tuple(cell._style)
+            if style_key not in styles:
+                styles[style_key] = cell_style(cell)
+            # Formula objects compare by their attributes
+            cells[cell.coordinate] = (getattr(cell.value, '__dict__', cell.value), style_key)
+        merged = {str(merged_range) for merged_range in sheet.merged_cells.ranges}
+        widths = {key: dimension.width for key, dimension in sheet.column_dimensions.items()}
+        sheets[sheet.title] = (cells, merged, widths)
+    return sheets, {key: styles[key] for key in sorted(styles)}
+
+
+@pytest.mark.parametrize('template', TEMPLATES)
+def test_copy_saves_like_a_fresh_load(template):
+    assert snapshot(saved(load_template(template))) == snapshot(saved(openpyxl.load_workbook(template)))
+
+
+def test_copies_are_independent():
+    first = load_template('990Template2.xlsm')
+    sheet = first['PEER GROUP']
+    sheet['B6'] = 'Edited'
+    sheet['B6'].font = openpyxl.styles.Font(bold=True)
+    sheet.merged_cells.add('B7:C7')
+    second = load_template('990Template2.xlsm')
+    assert second['PEER GROUP']['B6'].value != 'Edited'
+    assert 'B7:C7' not in {str(merged_range) for merged_range in second['PEER GROUP'].merged_cells.ranges}
+    assert snapshot(saved(second)) == snapshot(saved(openpyxl.load_workbook('990Template2.xlsm')))
+
+
+def test_insert_inside_a_multi_row_merge():
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet['A2'] = 'Label'
+    sheet['B4'] = 'Template'
+    sheet['B4'].font = openpyxl.styles.Font(bold=True)
+    sheet['D6'] = 'Below'
+    for merged in ('D1:E1', 'A2:A5', 'D6:E6'):
+        sheet.merge_cells(merged)
+    merged_index = MergedCellIndex(sheet)
+
+    insert_rows_with_formatting(sheet, 4, 2, merged_index)
+
+    # Above stays, spanning grows by the inserted rows, below moves down
+    assert {str(merged_range) for merged_range in sheet.merged_cells.ranges} == {'D1:E1', 'A2:A7', 'D8:E8'}
+    assert merged_index.get_top_left(5, 1) == (2, 1)
+    assert merged_index.get_top_left(8, 5) == (8, 4)
+    assert all(isinstance(sheet.cell(row=row, column=1), MergedCell) for row in range(3, 8))
+    assert [sheet.cell(row=row, column=2).value for row in (4, 5, 6)] == ['Template'] * 3
+    assert sheet['B5'].font.b
+    assert sheet['A2'].value == 'Label' and sheet['D8'].value == 'Below'
+
+    reloaded = saved(workbook).active
+    assert {str(merged_range) for merged_range in reloaded.merged_cells.ranges} == {'D1:E1', 'A2:A7', 'D8:E8'}
+    assert reloaded['A2'].value == 'Label'
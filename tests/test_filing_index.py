@@ -0,0 +1,30 @@
+from filing_index import FilingIndex, read_index_file
+
+INDEX_CSV = """RETURN_ID,FILING_TYPE,EIN,TAX_PERIOD,SUB_DATE,TAXPAYER_NAME,RETURN_TYPE,DLN,OBJECT_ID
+1,EFILE,12-3456789,202212,2023,EXAMPLE FOUNDATION,990,1,202301000000000100
+2,EFILE,123456789,202212,2023,EXAMPLE FOUNDATION,990T,2,202301000000000200
+3,EFILE,123456789,202112,2022,EXAMPLE FOUNDATION,990,3,202201000000000100
+4,EFILE,123456789,202112,2022,EXAMPLE FOUNDATION,990,4,202201000000000300
+5,EFILE,987654321,202206,2022,OTHER FUND,990PF,5,202201000000000400
+"""
+
+
+def test_only_main_returns_are_indexed(tmp_path):
+    path = tmp_path / 'index_2023.csv'
+    path.write_text(INDEX_CSV)
+    assert [record[3] for record in read_index_file(str(path))] == ['990', '990', '990', '990PF']
+
+    index = FilingIndex(':memory:')
+    index.load_file(str(path))
+    # The later 990-T does not replace the year's 990; an amended 990 does
+    assert index.lookup('12-3456789') == [
+        ('2022', '202301000000000100', '990'),
+        ('2021', '202201000000000300', '990'),
+    ]
+    assert index.lookup('987654321') == [('2021', '202201000000000400', '990PF')]
+
+
+def test_lookup_skips_other_returns_already_stored():
+    index = FilingIndex(':memory:')
+    index.load([('123456789', '2022', '202301000000000200', '990T'), ('123456789', '2021', '202201000000000100', '990')])
+    assert index.lookup('123456789') == [('2021', '202201000000000100', '990')]
@@ -0,0 +1,154 @@
+from io import BytesIO
+
+import pytest
+from lxml import etree
+
+import filing_parser
+from filing_cache import FilingCache
+from filing_parser import NOT_AVAILABLE, NotAFilingError, merge_individuals, parse_filing
+
+FILING = b"""<?xml version="1.0" encoding="utf-8"?>
+<Return xmlns="http://www.irs.gov/efile">
+  <ReturnHeader>
+    <TaxPeriodEndDt>2022-12-31</TaxPeriodEndDt>
+    <Filer>
+      <BusinessName><BusinessNameLine1Txt>EXAMPLE FOUNDATION</BusinessNameLine1Txt></BusinessName>
+      <USAddress><CityNm>AUSTIN</CityNm><StateAbbreviationCd>TX</StateAbbreviationCd></USAddress>
+    </Filer>
+  </ReturnHeader>
+  <ReturnData><IRS990><TotalEmployeeCnt>12</TotalEmployeeCnt></IRS990></ReturnData>
+</Return>
+"""
+PART_VII_ROW = """
+      <Form990PartVIISectionAGrp>
+        <PersonNm>Director {0}</PersonNm><TitleTxt>Director</TitleTxt>
+        <AverageHoursPerWeekRt>1.00</AverageHoursPerWeekRt>
+        <ReportableCompFromOrgAmt>0</ReportableCompFromOrgAmt>
+      </Form990PartVIISectionAGrp>"""
+SECTIONS_FILING = ("""<?xml version="1.0" encoding="utf-8"?>
+<Return xmlns="http://www.irs.gov/efile">
+  <ReturnHeader>
+    <TaxPeriodEndDt>2022-06-30</TaxPeriodEndDt>
+    <Filer><BusinessName><BusinessNameLine1Txt>EXAMPLE FOUNDATION</BusinessNameLine1Txt></BusinessName></Filer>
+  </ReturnHeader>
+  <ReturnData>
+    <IRS990>
+      <TotalAssetsEOYAmt>5000000</TotalAssetsEOYAmt>
+      <Form990PartVIISectionAGrp>
+        <PersonNm>Jane Doe</PersonNm><TitleTxt>CEO</TitleTxt>
+        <AverageHoursPerWeekRt>40.00</AverageHoursPerWeekRt>
+        <ReportableCompFromOrgAmt>250000</ReportableCompFromOrgAmt>
+        <OtherCompensationAmt>12000</OtherCompensationAmt>
+      </Form990PartVIISectionAGrp>
+      <Form990PartVIISectionAGrp>
+        <BusinessName><BusinessNameLine1Txt>Management Co LLC</BusinessNameLine1Txt></BusinessName>
+        <TitleTxt>Manager</TitleTxt>
+        <ReportableCompFromOrgAmt>90000</ReportableCompFromOrgAmt>
+      </Form990PartVIISectionAGrp>""" + "".join(PART_VII_ROW.format(n) for n in range(200)) + """
+    </IRS990>
+    <IRS990ScheduleJ>
+      <RltdOrgOfficerTrstKeyEmplGrp>
+        <PersonNm>Jane Doe</PersonNm><TitleTxt>CEO</TitleTxt>
+        <BaseCompensationFilingOrgAmt>230000</BaseCompensationFilingOrgAmt>
+        <BonusFilingOrganizationAmount>20000</BonusFilingOrganizationAmount>
+        <TotalCompensationFilingOrgAmt>262000</TotalCompensationFilingOrgAmt>
+      </RltdOrgOfficerTrstKeyEmplGrp>
+    </IRS990ScheduleJ>
+    <IRS990PF>
+      <OfficerDirTrstKeyEmplInfoGrp>
+        <OfficerDirTrstKeyEmplGrp>
+          <PersonNm>John Roe</PersonNm><TitleTxt>Trustee</TitleTxt>
+          <AverageHrsPerWkDevotedToPosRt>2.00</AverageHrsPerWkDevotedToPosRt>
+          <CompensationAmt>0</CompensationAmt>
+        </OfficerDirTrstKeyEmplGrp>
+      </OfficerDirTrstKeyEmplInfoGrp>
+    </IRS990PF>
+  </ReturnData>
+</Return>
+""").encode()
+ERROR_PAGE = b"<html><head><title>Not Found</title></head><body><p>Return not found</p></body></html>"
+
+
+@pytest.fixture(params=['in memory', 'streamed'])
+def parse_mode(request, monkeypatch):
+    if request.param == 'streamed':
+        monkeypatch.setattr(filing_parser, 'STREAMING_THRESHOLD_BYTES', 0)
+    return request.param
+
+
+def test_parses_a_return(parse_mode):
+    organization_data, _ = parse_filing(BytesIO(FILING), '123456789')
+    assert organization_data['Business Name'] == 'EXAMPLE FOUNDATION'
+    assert organization_data['Employee Count'] == '12'
+    assert organization_data['Total Assets EOY'] == NOT_AVAILABLE
+
+
+def test_rejects_a_page_that_is_not_a_return(parse_mode):
+    with pytest.raises(NotAFilingError):
+        parse_filing(BytesIO(ERROR_PAGE), '123456789')
+
+
+def test_truncated_return_is_a_syntax_error(parse_mode):
+    with pytest.raises(etree.XMLSyntaxError):
+        parse_filing(BytesIO(FILING[:len(FILING) // 2]), '123456789')
+
+
+def test_streaming_extracts_the_same_sections(monkeypatch):
+    in_memory = parse_filing(BytesIO(SECTIONS_FILING), '123456789')
+    monkeypatch.setattr(filing_parser, 'STREAMING_THRESHOLD_BYTES', 0)
+    streamed = parse_filing(BytesIO(SECTIONS_FILING), '123456789')
+    assert streamed == in_memory
+
+    organization_data, (schedule_j, part_vii, pf) = streamed
+    assert organization_data['Total Assets EOY'] == '5000000'
+    assert [(row['Name'], row['Base Compensation'], row['Bonus']) for row in schedule_j] == [('Jane Doe', '230000', '20000')]
+    # Schedule J rows share the Part VII column names the pages display
+    assert schedule_j[0]['Avg Hr Per Week (Part VII)'] == NOT_AVAILABLE
+    assert len(part_vii) == 202
+    assert part_vii[0]['Other Compensation (Part VII)'] == '12000'
+    assert part_vii[1]['Name'] == 'Management Co LLC'
+    assert part_vii[-1]['Name'] == 'Director 199'
+    assert [(row['Name'], row['Avg Hr Per Week (PF)']) for row in pf] == [('John Roe', '2.00')]
+
+
+def test_filing_read_through_the_cache_is_committed(tmp_path, monkeypatch):
+    monkeypatch.setattr(filing_parser, 'STREAMING_THRESHOLD_BYTES', 0)
+    cache = FilingCache(str(tmp_path))
+    accept = lambda head: b'<Return' in head
+    with cache.tee('202301000000000100', BytesIO(SECTIONS_FILING), accept=accept) as reader:
+        parsed = parse_filing(reader, '123456789')
+    assert cache.get('202301000000000100') == SECTIONS_FILING
+    with cache.open('202301000000000100') as cached:
+        assert parse_filing(cached, '123456789') == parsed
+
+    with cache.tee('error-page', BytesIO(ERROR_PAGE), accept=accept) as reader:
+        with pytest.raises(NotAFilingError):
+            parse_filing(reader, '123456789')
+    assert cache.get('error-page') is None
+
+
+def test_merge_individuals_across_sources():
+    schedule_j = [
+        {'Name': 'Jane Doe', 'Title': 'CEO', 'Base Compensation': '100'},
+        {'Name': 'John Roe', 'Title': 'CFO', 'Base Compensation': '80'},
+    ]
+    part_vii = [
+        # Same person in another case and punctuation
+        {'Name': 'JANE DOE', 'Title': 'ceo.', 'Reportable Compensation (Part VII)': '90'},
+        # Same name, different title in another source: still the same person
+        {'Name': 'John Roe', 'Title': 'Treasurer', 'Reportable Compensation (Part VII)': '70'},
+        # Same name twice in one source with different titles: two people
+        {'Name': 'Ann Lee', 'Title': 'Director', 'Reportable Compensation (Part VII)': '0'},
+        {'Name': 'Ann Lee', 'Title': 'Secretary', 'Reportable Compensation (Part VII)': '0'},
+    ]
+    pf = [{'Name': 'Ann Lee', 'Title': 'Director', 'Reportable Compensation (PF)': '5'}]
+
+    assert merge_individuals(schedule_j, part_vii, pf) == [
+        {'Name': 'JANE DOE', 'Title': 'ceo.', 'Base Compensation': '100',
+         'Reportable Compensation (Part VII)': '90', 'Sources': 'Schedule J, Part VII'},
+        {'Name': 'John Roe', 'Title': 'Treasurer', 'Base Compensation': '80',
+         'Reportable Compensation (Part VII)': '70', 'Sources': 'Schedule J, Part VII'},
+        {'Name': 'Ann Lee', 'Title': 'Director', 'Reportable Compensation (Part VII)': '0',
+         'Reportable Compensation (PF)': '5', 'Sources': 'Part VII, 990-PF'},
+        {'Name': 'Ann Lee', 'Title': 'Secretary', 'Reportable Compensation (Part VII)': '0', 'Sources': 'Part VII'},
+    ]
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+from geopy.exc import GeocoderTimedOut
+
+from geocoder import Geocoder
+
+
+def make_geocoder(tmp_path, answer):
+    geocoder = Geocoder(':memory:', gazetteer_dir=str(tmp_path))
+    calls = []
+
+    def geocode(location):
+        calls.append(location)
+        return answer(location)
+
+    geocoder._geocode = geocode
+    return geocoder, calls
+
+
+def test_service_errors_are_not_remembered_as_misses(tmp_path):
+    def timeout(location):
+        raise GeocoderTimedOut('timed out')
+
+    geocoder, calls = make_geocoder(tmp_path, timeout)
+    assert geocoder.geocode('Austin, TX') is None
+    assert geocoder.geocode('Austin, TX') is None
+    assert len(calls) == 2
+
+
+def test_no_result_is_remembered(tmp_path):
+    geocoder, calls = make_geocoder(tmp_path, lambda location: None)
+    assert geocoder.geocode('Nowhere, TX') is None
+    assert geocoder.geocode('nowhere,  tx') is None
+    assert len(calls) == 1
+
+
+def test_hits_are_cached(tmp_path):
+    geocoder, calls = make_geocoder(tmp_path, lambda location: SimpleNamespace(latitude=30.27, longitude=-97.74))
+    assert geocoder.geocode('Austin, TX') == (30.27, -97.74)
+    assert geocoder.geocode('Austin, TX') == (30.27, -97.74)
+    assert len(calls) == 1
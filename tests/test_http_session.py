@@ -0,0 +1,50 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+import http_session
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    # Answers 503 to the first two requests and 200 afterwards
+    failures = 2
+    requests = 0
+
+    def do_GET(self):
+        type(self).requests += 1
+        status = 503 if type(self).requests <= self.failures else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    FlakyHandler.requests = 0
+    httpd = HTTPServer(('127.0.0.1', 0), FlakyHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}/"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_every_request_sent_takes_a_token(server, monkeypatch):
+    monkeypatch.setattr(http_session, 'BACKOFF_FACTOR', 0)
+    monkeypatch.setattr(http_session, '_session', http_session._build_session())
+    monkeypatch.setattr(http_session, '_buckets', {})
+    acquired = []
+    bucket = http_session.get_bucket(server)
+    monkeypatch.setattr(bucket, 'acquire', lambda: acquired.append(1))
+
+    response = http_session.get(server)
+
+    assert response.status_code == 200
+    # One logical get, three requests on the wire: the first attempt and two retries
+    assert FlakyHandler.requests == 3
+    assert len(acquired) == 3
@@ -0,0 +1,22 @@
+import pandas as pd
+
+from irs990_store import LOCATION_FIELDS, PEER_COLUMNS, PEER_FIELDS, Irs990Store
+
+
+def test_peers_come_back_with_plain_string_locations(tmp_path):
+    filings = pd.DataFrame({column: [None] * 3 for column in PEER_COLUMNS})
+    filings['FILEREIN'] = ['000000001', '000000002', '000000003']
+    filings['TAXYEAR'] = 2022
+    filings['FILERUSCITY'] = ['Austin', 'Dallas', 'Los Angeles']
+    filings['FILERUSSTATE'] = ['tx', 'TX', 'CA']
+    filings['FILERUSZIP'] = ['78701', '75201', '90001']
+    for field in PEER_FIELDS.values():
+        filings[field] = 1.0
+    filings.to_parquet(tmp_path / '2022.parquet')
+
+    peers = Irs990Store(str(tmp_path)).find_peers(state='TX')
+
+    assert list(peers['FILEREIN']) == ['000000001', '000000002']
+    assert not any(isinstance(peers[column].dtype, pd.CategoricalDtype) for column in LOCATION_FIELDS)
+    # Grouping only sees the cities in the result, not every city in the store
+    assert list(peers.groupby(['FILERUSCITY', 'FILERUSSTATE']).groups) == [('AUSTIN', 'TX'), ('DALLAS', 'TX')]
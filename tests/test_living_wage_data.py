@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from living_wage_data import MONETARY_COLUMNS, WageVariants
+
+
+def sparse_sheet():
+    data = pd.DataFrame(
+        [[1000.0, 500.0, 300.0, 800.0, 200.0, 0.0, 400.0],
+         [1200.0, np.nan, 350.0, 900.0, 250.0, 600.0, np.nan],
+         [900.0, 450.0, np.nan, np.nan, 150.0, 0.0, 300.0]],
+        columns=MONETARY_COLUMNS,
+    )
+    data['Total'] = [3200.0, np.nan, 1800.0]
+    return data
+
+
+def dashboard_totals(data, selected_columns):
+    # The dashboard's original row-wise sums, which skip blank cells
+    living = data[selected_columns].astype(float).sum(axis=1)
+    credited = data.copy()
+    credited['Healthcare'] *= 0.20
+    credit = credited[selected_columns].astype(float).sum(axis=1) if 'Healthcare' in selected_columns else living
+    credited['Other Necessities '] *= 2
+    thriving = credited[selected_columns].astype(float).sum(axis=1)
+    return living, credit, thriving
+
+
+def test_totals_match_row_sums_with_blank_cells():
+    data = sparse_sheet()
+    # Food is blank in row 1 and selected; Taxes is blank in row 1 and not selected
+    selected = ['Housing', 'Food', 'Healthcare', 'Other Necessities ']
+    totals = WageVariants(data).totals(selected)
+    living, credit, thriving = dashboard_totals(data, selected)
+    assert not totals.isna().any().any()
+    np.testing.assert_allclose(totals['Living'], living)
+    np.testing.assert_allclose(totals['Healthcare Credit'], credit)
+    np.testing.assert_allclose(totals['Thriving'], thriving)
+
+
+def test_empty_selection_keeps_sheet_total():
+    data = sparse_sheet()
+    totals = WageVariants(data).totals([])
+    np.testing.assert_allclose(totals['Living'], [3200.0, 0.0, 1800.0])
+    np.testing.assert_allclose(totals['Healthcare Credit'], totals['Living'])
+    np.testing.assert_allclose(totals['Thriving'], [0.0, 0.0, 0.0])
@@ -0,0 +1,38 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from living_wage_data import MONETARY_COLUMNS, AreaIndex, WageVariants
+from living_wage_export import iter_exhibits, write_exhibits_workbook
+
+
+def sparse_sheet():
+    data = pd.DataFrame(
+        [[1000.0, 500.0, 300.0, 800.0, 200.0, 0.0, 400.0],
+         [1200.0, np.nan, 350.0, 900.0, 250.0, 600.0, np.nan]],
+        columns=MONETARY_COLUMNS,
+    )
+    data['State abv.'] = 'AL'
+    data['County'] = 'Autauga County'
+    data['Provider'] = [1, 2]
+    data['Dependent'] = [0, 1]
+    data['Total'] = [3200.0, np.nan]
+    return data
+
+
+def test_sparse_row_exports_its_totals():
+    data = sparse_sheet()
+    selected = ['Housing', 'Food', 'Healthcare', 'Other Necessities ']
+    exhibits = list(iter_exhibits(AreaIndex(data, 'County'), WageVariants(data), ['AL'], selected, [1, 2], [0, 1]))
+    # Row 1 has a blank Food (selected) and a blank Taxes (not selected)
+    assert exhibits == [('AL', 'Autauga County', [('1,0', 1.86, 2.06), ('2,1', 1.63, 1.88)])]
+
+    stream = BytesIO()
+    assert write_exhibits_workbook(exhibits, stream, charts=False) == 1
+    workbook = load_workbook(BytesIO(stream.getvalue()))
+    exhibit = workbook['AL Autauga County']
+    assert [[cell.value for cell in row] for row in exhibit.iter_rows(min_row=4, min_col=2)] == [[1.86, 2.06], [1.63, 1.88]]
+    summary = workbook['Summary']
+    assert [row[3:] for row in summary.iter_rows(min_row=2, values_only=True)] == [(1.86, 2.06), (1.63, 1.88)]
@@ -0,0 +1,47 @@
+import pandas as pd
+
+from location_index import LocationIndex
+
+PLACES = {'AUSTIN, TX, 78701': (30.27, -97.74), 'DALLAS, TX': (32.78, -96.80)}
+
+
+def test_rows_without_coordinates_are_geocoded_once_per_place():
+    index = LocationIndex(':memory:')
+    calls = []
+
+    def geocode(place):
+        calls.append(place)
+        return PLACES.get(place)
+
+    df = pd.DataFrame({
+        'ein': ['1', '2', '3', '4', '5'],
+        'city': ['AUSTIN', 'AUSTIN', 'DALLAS', None, 'NOWHERE'],
+        'state': ['TX', 'TX', 'TX', 'TX', 'TX'],
+        'zipcode': ['78701', '78701', None, None, '00000'],
+    })
+    assert index.add_frame(df, 'ein') == 0
+    assert index.add_frame(df, 'ein', geocode=geocode, location_columns=('city', 'state', 'zipcode')) == 3
+    # A state alone is not a location
+    assert calls == ['AUSTIN, TX, 78701', 'DALLAS, TX', 'NOWHERE, TX, 00000']
+    assert index.indexed(df['ein']) == {'1', '2', '3'}
+    assert set(index.nearby(PLACES['AUSTIN, TX, 78701'], 10)) == {'1', '2'}
+
+    calls.clear()
+    index.add_frame(df, 'ein', geocode=geocode, location_columns=('city', 'state', 'zipcode'))
+    assert calls == ['NOWHERE, TX, 00000']
+
+
+def test_geocoding_stops_at_the_time_budget():
+    index = LocationIndex(':memory:')
+    calls = []
+
+    def geocode(place):
+        calls.append(place)
+        return PLACES.get(place)
+
+    df = pd.DataFrame({'ein': ['1', '2', '3'], 'city': ['AUSTIN', 'AUSTIN', 'DALLAS'], 'state': ['TX'] * 3, 'zipcode': ['78701', '78701', None]})
+    # The most common place is still geocoded; the rest wait for the next call
+    assert index.add_frame(df, 'ein', geocode=geocode, location_columns=('city', 'state', 'zipcode'), time_budget=0) == 2
+    assert calls == ['AUSTIN, TX, 78701']
+    assert index.add_frame(df, 'ein', geocode=geocode, location_columns=('city', 'state', 'zipcode'), time_budget=0) == 1
+    assert calls == ['AUSTIN, TX, 78701', 'DALLAS, TX']